@@ -0,0 +1,110 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+from docplex.mp.utils import DOcplexLimitsExceeded
+
+from benchmarks.suite import (
+    END_PRODUCTS,
+    GAP,
+    SCENARIO,
+    SEED,
+    TIMELIMIT,
+    suite_instances,
+)
+from data import DataMultipleProducts
+from formulacao import Formulacao1
+from highs_backend import HighsFormulacao1
+
+BACKENDS = {"cplex": Formulacao1, "highs": HighsFormulacao1}
+# relative slack when comparing an objective against the other bound
+TOLERANCE = 1e-6
+
+
+def _solve(f1):
+    if f1.backend == "highs":
+        solution, kpis = f1.solve()
+        if solution is None:
+            return None, kpis["Best Bound"], kpis["Tempo de Solução"], "no solution"
+        return (
+            kpis["objective_function"],
+            kpis["Best Bound"],
+            kpis["Tempo de Solução"],
+            kpis["status"],
+        )
+    result = f1.model.solve()
+    details = f1.model.solve_details
+    objective = result.objective_value if result is not None else None
+    return objective, details.best_bound, details.time, str(details.status)
+
+
+def run_case(
+    dataset: str,
+    amount_of_end_products: int,
+    backend: str,
+    gap: float,
+    timelimit: float,
+) -> dict:
+    np.random.seed(SEED)
+    data = DataMultipleProducts(
+        dataset,
+        amount_of_end_products=amount_of_end_products,
+        random_demand=True,
+        **SCENARIO,
+    )
+    f1 = BACKENDS[backend](
+        data, vectorized=True, presolve=True, tight_big_m=True, solver_kpis=False
+    )
+    f1.set_parameters(timelimit, threads=1, mipgap=gap)
+    try:
+        objective, bound, time, status = _solve(f1)
+    except DOcplexLimitsExceeded:
+        return {"status": "skipped: size limit"}
+    return {"status": status, "objective": objective, "bound": bound, "time": time}
+
+
+def compare_backends(gap: float = GAP, timelimit: float = TIMELIMIT) -> pd.DataFrame:
+    """Same cases on both backends. They agree when neither incumbent is below
+    the bound the other backend proved."""
+    records = []
+    for dataset in suite_instances():
+        for amount_of_end_products in END_PRODUCTS:
+            for backend in BACKENDS:
+                record = {
+                    "instance": dataset.split(".")[0],
+                    "amount_of_end_products": amount_of_end_products,
+                    "backend": backend,
+                }
+                record.update(
+                    run_case(dataset, amount_of_end_products, backend, gap, timelimit)
+                )
+                records.append(record)
+    df = pd.DataFrame(records).pivot(
+        index=["instance", "amount_of_end_products"], columns="backend"
+    )
+    if "objective" not in df:
+        return df
+    # Community Edition: cases over the size limit have no CPLEX objective
+    solved = df.dropna(subset=[("objective", "cplex"), ("objective", "highs")])
+    slack = TOLERANCE * solved["objective"].abs().max(axis=1)
+    solved = solved.assign(
+        agree=(solved["objective", "highs"] >= solved["bound", "cplex"] - slack)
+        & (solved["objective", "cplex"] >= solved["bound", "highs"] - slack),
+        difference=(solved["objective", "highs"] - solved["objective", "cplex"])
+        / solved["objective", "cplex"].abs(),
+    )
+    return solved[["objective", "time", "difference", "agree"]]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Objective of CPLEX and HiGHS on the benchmark suite cases, "
+        "checked against each other's bound."
+    )
+    parser.add_argument("--gap", type=float, default=GAP)
+    parser.add_argument("--timelimit", type=float, default=TIMELIMIT)
+    args = parser.parse_args()
+    df = compare_backends(gap=args.gap, timelimit=args.timelimit)
+    print(df.to_string(float_format="{:.6g}".format))
+    if "agree" in df and not df["agree"].all():
+        raise SystemExit("backends disagree")
@@ -0,0 +1,108 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+from docplex.mp.utils import DOcplexLimitsExceeded
+
+from benchmarks.suite import (
+    END_PRODUCTS,
+    GAP,
+    SCENARIO,
+    SEED,
+    TIMELIMIT,
+    suite_instances,
+)
+from data import DataMultipleProducts
+from formulacao import Formulacao1
+from utils import RootBoundListener, solve_lp_relaxation
+
+
+def run_case(
+    dataset: str,
+    amount_of_end_products: int,
+    tight_big_m: bool,
+    gap: float,
+    timelimit: float,
+) -> dict:
+    np.random.seed(SEED)
+    data = DataMultipleProducts(
+        dataset,
+        amount_of_end_products=amount_of_end_products,
+        random_demand=True,
+        **SCENARIO,
+    )
+    f1 = Formulacao1(data, vectorized=True, presolve=True, tight_big_m=tight_big_m)
+    mdl = f1.model
+    mdl.set_time_limit(timelimit)
+    mdl.parameters.mip.tolerances.mipgap = gap
+    mdl.context.cplex_parameters.threads = 1
+    root_bound = RootBoundListener()
+    mdl.add_progress_listener(root_bound)
+    try:
+        result = mdl.solve()
+    except DOcplexLimitsExceeded:
+        mdl.end()
+        return {"status": "skipped: size limit"}
+    details = mdl.solve_details
+    record = {
+        "status": str(details.status),
+        "objective": result.objective_value if result is not None else None,
+        "lp_bound": solve_lp_relaxation(mdl),
+        "root_bound": (
+            details.best_bound
+            if details.nb_nodes_processed == 0
+            else root_bound.root_bound
+        ),
+        "nodes": details.nb_nodes_processed,
+        "time": details.time,
+    }
+    mdl.end()
+    return record
+
+
+def compare_big_m(gap: float = GAP, timelimit: float = TIMELIMIT) -> pd.DataFrame:
+    # same cases as the suite, loose and tight big-M side by side
+    records = []
+    for dataset in suite_instances():
+        for amount_of_end_products in END_PRODUCTS:
+            for tight_big_m in (False, True):
+                record = {
+                    "instance": dataset.split(".")[0],
+                    "amount_of_end_products": amount_of_end_products,
+                    "big_m": "tight" if tight_big_m else "loose",
+                }
+                record.update(
+                    run_case(
+                        dataset, amount_of_end_products, tight_big_m, gap, timelimit
+                    )
+                )
+                records.append(record)
+    df = pd.DataFrame(records)
+    if "objective" not in df:
+        # Community Edition: every case over the size limit
+        return df
+    solved = df.dropna(subset=["objective"])
+    # gaps against the best objective of either run
+    best = solved.groupby(["instance", "amount_of_end_products"])["objective"].min()
+    best = solved.join(best.rename("best"), on=["instance", "amount_of_end_products"])
+    solved = solved.assign(
+        lp_gap=(best["best"] - solved["lp_bound"]) / best["best"],
+        root_gap=(best["best"] - solved["root_bound"]) / best["best"],
+    )
+    return solved.pivot_table(
+        index=["instance", "amount_of_end_products"],
+        columns="big_m",
+        values=["lp_gap", "root_gap", "nodes", "time"],
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Root gap, nodes and time with the loose and the tight "
+        "setup big-M on the benchmark suite cases."
+    )
+    parser.add_argument("--gap", type=float, default=GAP)
+    parser.add_argument("--timelimit", type=float, default=TIMELIMIT)
+    args = parser.parse_args()
+    df = compare_big_m(gap=args.gap, timelimit=args.timelimit)
+    print(df.to_string(float_format="{:.4g}".format))
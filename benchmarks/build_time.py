@@ -0,0 +1,96 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+import constants
+from data import DataMultipleProducts
+from formulacao import Formulacao1
+
+REPETITIONS = 3
+
+
+def model_matrix(mdl):
+    cpx = mdl.get_cplex()
+    rows = [dict(zip(row.ind, row.val)) for row in cpx.linear_constraints.get_rows()]
+    return (
+        cpx.variables.get_names(),
+        cpx.variables.get_types(),
+        rows,
+        cpx.linear_constraints.get_rhs(),
+        cpx.linear_constraints.get_senses(),
+        cpx.objective.get_linear(),
+    )
+
+
+def same_model(mdl_a, mdl_b, rel_tol: float = 1e-12) -> bool:
+    names_a, types_a, rows_a, rhs_a, senses_a, obj_a = model_matrix(mdl_a)
+    names_b, types_b, rows_b, rhs_b, senses_b, obj_b = model_matrix(mdl_b)
+    if (names_a, types_a, senses_a) != (names_b, types_b, senses_b):
+        return False
+    if not np.allclose(rhs_a, rhs_b, rtol=rel_tol, atol=0):
+        return False
+    if not np.allclose(obj_a, obj_b, rtol=rel_tol, atol=0):
+        return False
+    for row_a, row_b in zip(rows_a, rows_b):
+        if row_a.keys() != row_b.keys():
+            return False
+        for col, val in row_a.items():
+            if not np.isclose(val, row_b[col], rtol=rel_tol, atol=0):
+                return False
+    return True
+
+
+def time_build(data, vectorized: bool) -> float:
+    timings = []
+    for _ in range(REPETITIONS):
+        start = time.perf_counter()
+        f1 = Formulacao1(data, vectorized=vectorized)
+        timings.append(time.perf_counter() - start)
+        f1.model.end()
+    return min(timings)
+
+
+def compare_build_modes(instances, end_products, type_cap_ingredients="S"):
+    records = []
+    for dataset in instances:
+        for amount_of_end_products in end_products:
+            np.random.seed(0)
+            data = DataMultipleProducts(
+                dataset,
+                capacity_multiplier=1.1,
+                amount_of_end_products=amount_of_end_products,
+                type_cap_ingredients=type_cap_ingredients,
+                coef_cap=1.1,
+                random_demand=True,
+            )
+            expression = Formulacao1(data)
+            vectorized = Formulacao1(data, vectorized=True)
+            identical = same_model(expression.model, vectorized.model)
+            expression.model.end()
+            vectorized.model.end()
+            records.append(
+                {
+                    "Instance": data.instance,
+                    "amount_of_end_products": amount_of_end_products,
+                    "expression_build": time_build(data, vectorized=False),
+                    "vectorized_build": time_build(data, vectorized=True),
+                    "identical": identical,
+                }
+            )
+            print(records[-1])
+    df = pd.DataFrame(records)
+    df["speedup"] = df["expression_build"] / df["vectorized_build"]
+    return df
+
+
+if __name__ == "__main__":
+    instances = [
+        dataset for dataset in constants.INSTANCES if dataset.endswith("1.DAT.dat")
+    ]
+    df = compare_build_modes(instances, constants.END_PRODUCTS)
+    print(df.to_string(index=False))
+    print(
+        f"Total: {df['expression_build'].sum():.3f}s -> "
+        f"{df['vectorized_build'].sum():.3f}s, all identical: {df['identical'].all()}"
+    )
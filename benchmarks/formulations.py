@@ -0,0 +1,82 @@
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+import constants
+from result_store import get_result_sink
+from scheduler import instance_features
+
+SCENARIO_COLUMNS = [
+    "Instance",
+    "amount_of_end_products",
+    "capacity_multiplier",
+    "type_cap_ingredients",
+    "coef_cap",
+]
+COMPARED_COLUMNS = [
+    "status",
+    "objective_function",
+    "Gap",
+    "Tempo de Solução",
+    "Root Bound",
+    "Relaxed Objective Value",
+]
+
+
+def load_results(formulation: str) -> pd.DataFrame:
+    df = get_result_sink(formulation).compact()
+    missing = [c for c in COMPARED_COLUMNS if c not in df]
+    return df.assign(**{c: float("nan") for c in missing})[
+        SCENARIO_COLUMNS + COMPARED_COLUMNS
+    ]
+
+
+def compare_formulations(baseline: str, candidate: str) -> pd.DataFrame:
+    """One row per scenario solved by both formulations; LP and root gaps are
+    measured against the best objective either of them found."""
+    df = load_results(baseline).merge(
+        load_results(candidate),
+        on=SCENARIO_COLUMNS,
+        suffixes=(f" {baseline}", f" {candidate}"),
+    )
+    best = df[[f"objective_function {name}" for name in (baseline, candidate)]].min(
+        axis=1
+    )
+    for name in (baseline, candidate):
+        df[f"LP Gap {name}"] = (best - df[f"Relaxed Objective Value {name}"]) / best
+        df[f"Root Gap {name}"] = (best - df[f"Root Bound {name}"]) / best
+    features = df["Instance"].map(instance_features)
+    df["ingredients"] = features.str[0]
+    df["instance_class"] = features.str[1]
+    return df
+
+
+def summarize(df: pd.DataFrame, baseline: str, candidate: str) -> pd.DataFrame:
+    columns = {}
+    for name in (baseline, candidate):
+        columns[f"Optimal {name}"] = (
+            f"status {name}",
+            lambda s: (s == "OPTIMAL_SOLUTION").mean(),
+        )
+        for metric in ("Gap", "Tempo de Solução", "LP Gap", "Root Gap"):
+            columns[f"{metric} {name}"] = (f"{metric} {name}", "mean")
+    return df.groupby(["ingredients", "instance_class", "amount_of_end_products"]).agg(
+        **columns
+    )
+
+
+if __name__ == "__main__":
+    # python -m benchmarks.formulations [baseline] [candidate]
+    baseline = sys.argv[1] if len(sys.argv) > 1 else "formulacao1"
+    candidate = sys.argv[2] if len(sys.argv) > 2 else "formulacao2"
+    df = compare_formulations(baseline, candidate)
+    summary = summarize(df, baseline, candidate)
+    print(f"{len(df)} cenários resolvidos pelas duas formulações")
+    print(summary.T.to_string(float_format="{:.4g}".format))
+    path_to_save = (
+        Path(constants.FINAL_PATH) / f"comparacao_{baseline}_{candidate}.xlsx"
+    )
+    with pd.ExcelWriter(path_to_save, engine="openpyxl") as writer:
+        summary.to_excel(writer, sheet_name="resumo")
+        df.to_excel(writer, sheet_name="cenarios", index=False)
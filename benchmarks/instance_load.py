@@ -0,0 +1,72 @@
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import constants
+from data import Data
+from instance_cache import cache_file, compile_instance, load_instance
+from read_file import ReadData
+
+REPETITIONS = 5
+
+
+def time_loads(files, load) -> float:
+    start = time.perf_counter()
+    for file_to_read in files:
+        load(file_to_read)
+    return time.perf_counter() - start
+
+
+def pandas_table(file_to_read: str):
+    return ReadData(file_to_read).get_df().to_numpy(dtype=float)
+
+
+def compare_loads(files) -> pd.DataFrame:
+    with tempfile.TemporaryDirectory() as cache_path:
+        pandas_parse = time_loads(files, pandas_table)
+        parse = time_loads(files, compile_instance)
+        # load_instance only goes through the cache when it is on
+        instance_cache = constants.INSTANCE_CACHE
+        constants.INSTANCE_CACHE = True
+        try:
+            cold = time_loads(files, lambda f: load_instance(f, cache_path=cache_path))
+            missing = [f for f in files if not cache_file(f, cache_path).exists()]
+            assert not missing, f"cache not written for {missing}"
+            warm = min(
+                time_loads(files, lambda f: load_instance(f, cache_path=cache_path))
+                for _ in range(REPETITIONS)
+            )
+            identical = all(
+                np.array_equal(pandas_table(f), compile_instance(f), equal_nan=True)
+                and np.array_equal(
+                    compile_instance(f),
+                    load_instance(f, cache_path=cache_path),
+                    equal_nan=True,
+                )
+                for f in files
+            )
+        finally:
+            constants.INSTANCE_CACHE = instance_cache
+    data = min(time_loads(files, Data) for _ in range(REPETITIONS))
+    return pd.DataFrame(
+        [
+            {
+                "files": len(files),
+                "pandas parse": pandas_parse,
+                "parse": parse,
+                "cold cache": cold,
+                "warm cache": warm,
+                "Data (warm)": data,
+                "speedup": pandas_parse / warm,
+                "identical": identical,
+            }
+        ]
+    )
+
+
+if __name__ == "__main__":
+    files = sorted(path.name for path in (Path.cwd() / "data").glob("*.DAT.dat"))
+    print(compare_loads(files).to_string(index=False))
@@ -0,0 +1,194 @@
+import argparse
+import json
+import socket
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from docplex.mp.utils import DOcplexLimitsExceeded
+
+from data import DataMultipleProducts
+from formulacao import Formulacao1
+from phase_timer import PhaseTimer
+from result_store import SqliteResultSink
+from utils import extract_variables
+
+SEED = 0
+INGREDIENTS = [2, 5, 10]
+INSTANCE_CLASSES = ["LLL", "HHH"]
+END_PRODUCTS = [1, 5, 10]
+SCENARIO = {"capacity_multiplier": 1.1, "type_cap_ingredients": "S", "coef_cap": 1.1}
+GAP = 0.01
+TIMELIMIT = 10
+HISTORY_PATH = Path(__file__).parent / "history.jsonl"
+PHASES = ("Read Data", "Build", "Solve", "Extract", "Save")
+
+
+def suite_instances(seed: int = SEED):
+    # one fixed instance number per (ingredients, class), drawn once from the seed
+    rng = np.random.default_rng(seed)
+    return [
+        f"{ingredients}{instance_class}{rng.integers(1, 11)}.DAT.dat"
+        for ingredients in INGREDIENTS
+        for instance_class in INSTANCE_CLASSES
+    ]
+
+
+def git_revision() -> str:
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{revision}-dirty" if dirty else revision
+
+
+def run_case(
+    dataset: str,
+    amount_of_end_products: int,
+    gap: float,
+    timelimit: float,
+    output_path: Path,
+) -> dict:
+    phases = PhaseTimer()
+    np.random.seed(SEED)
+    with phases.phase("Read Data"):
+        data = DataMultipleProducts(
+            dataset,
+            amount_of_end_products=amount_of_end_products,
+            random_demand=True,
+            **SCENARIO,
+        )
+    with phases.phase("Build"):
+        f1 = Formulacao1(data, vectorized=True)
+    mdl = f1.model
+    mdl.set_time_limit(timelimit)
+    mdl.parameters.mip.tolerances.mipgap = gap
+    mdl.context.cplex_parameters.threads = 1
+    try:
+        with phases.phase("Solve"):
+            result = mdl.solve()
+        record = {"status": str(mdl.solve_details.status)}
+    except DOcplexLimitsExceeded:
+        # Community Edition: loading and building are still timed
+        result = None
+        record = {"status": "skipped: size limit"}
+    if result is not None:
+        with phases.phase("Extract"):
+            solution = extract_variables(mdl, f1)
+        with phases.phase("Save"):
+            solution.save(output_path / f"{data}.npz")
+            sink = SqliteResultSink(path=output_path, batch_size=1)
+            sink.append(str(data), mdl.kpis_as_dict(result))
+        record["objective"] = result.objective_value
+        record["gap"] = mdl.solve_details.mip_relative_gap
+    mdl.end()
+    record.update(
+        {
+            f"{name} {field}": value
+            for name, values in phases.phases.items()
+            for field, value in zip(("wall", "cpu", "peak_rss_mb"), values)
+        }
+    )
+    return record
+
+
+def run_suite(gap: float = GAP, timelimit: float = TIMELIMIT) -> pd.DataFrame:
+    revision = git_revision()
+    started_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+    records = []
+    with tempfile.TemporaryDirectory() as output_path:
+        for dataset in suite_instances():
+            for amount_of_end_products in END_PRODUCTS:
+                case = {
+                    "revision": revision,
+                    "started_at": started_at,
+                    "host": socket.gethostname(),
+                    "instance": dataset.split(".")[0],
+                    "amount_of_end_products": amount_of_end_products,
+                    "gap_target": gap,
+                    "timelimit": timelimit,
+                }
+                case.update(
+                    run_case(
+                        dataset,
+                        amount_of_end_products,
+                        gap,
+                        timelimit,
+                        Path(output_path),
+                    )
+                )
+                records.append(case)
+                print(
+                    f"{case['instance']} prod {amount_of_end_products}: "
+                    f"{case['status']}"
+                )
+    with open(HISTORY_PATH, "a") as f:
+        for case in records:
+            f.write(json.dumps(case) + "\n")
+    return pd.DataFrame(records)
+
+
+def read_history(path: Path = HISTORY_PATH) -> pd.DataFrame:
+    with open(path) as f:
+        return pd.DataFrame([json.loads(line) for line in f if line.strip()])
+
+
+def compare_revisions(
+    history: pd.DataFrame, baseline: str, candidate: str = None
+) -> pd.DataFrame:
+    # latest run of each revision, wall time per phase and ratio candidate/baseline
+    candidate = candidate or history["revision"].iloc[-1]
+    keys = ["instance", "amount_of_end_products"]
+    columns = [f"{phase} wall" for phase in PHASES if f"{phase} wall" in history]
+
+    def latest(revision):
+        runs = history[history["revision"] == revision]
+        if runs.empty:
+            raise ValueError(
+                f"revision {revision} not in the history, "
+                f"known: {', '.join(history['revision'].unique())}"
+            )
+        runs = runs[runs["started_at"] == runs["started_at"].max()]
+        return runs.set_index(keys)[columns]
+
+    before, after = latest(baseline), latest(candidate)
+    ratio = (after / before).dropna(how="all")
+    totals = pd.DataFrame(
+        {"baseline": before.sum(), "candidate": after.sum()},
+    )
+    totals["ratio"] = totals["candidate"] / totals["baseline"]
+    print(f"{candidate} vs {baseline}")
+    print(totals.to_string(float_format="{:.3f}".format))
+    return ratio
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Time loading, building, solving and saving on a fixed "
+        "subset of instances and append the results to the history."
+    )
+    parser.add_argument("--gap", type=float, default=GAP)
+    parser.add_argument("--timelimit", type=float, default=TIMELIMIT)
+    parser.add_argument(
+        "--compare", metavar="REVISION", help="baseline revision in the history"
+    )
+    args = parser.parse_args()
+    df = run_suite(gap=args.gap, timelimit=args.timelimit)
+    columns = [f"{phase} wall" for phase in PHASES if f"{phase} wall" in df]
+    print(df[["instance", "amount_of_end_products", "status"] + columns].to_string())
+    if args.compare:
+        compare_revisions(read_history(), args.compare)
@@ -0,0 +1,58 @@
+import importlib.abc
+import sys
+import tempfile
+
+INSTANCE = "2LLL1.DAT.dat"
+
+
+class BlockCplex(importlib.abc.MetaPathFinder):
+    # a node without the CPLEX Python package
+    def find_spec(self, name, path, target=None):
+        if name == "cplex" or name.startswith("cplex."):
+            raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+        return None
+
+
+def check_without_cplex() -> None:
+    """Imports main and solves one scenario through solve_formulation with
+    HiGHS while cplex cannot be imported.
+
+    A full MIP solve, run by hand: python -m benchmarks.without_cplex
+    """
+    sys.meta_path.insert(0, BlockCplex())
+    for name in [name for name in sys.modules if name.split(".")[0] == "cplex"]:
+        del sys.modules[name]
+    import constants
+    import main  # noqa: F401
+    from data import DataMultipleProducts
+    from highs_backend import HighsFormulacao1
+    from phase_timer import PhaseTimer
+    from utils import solve_formulation
+
+    settings = constants.TIMELIMIT, constants.RESULT_SINK, constants.RESULTS_PATH
+    # results of the check are not kept
+    with tempfile.TemporaryDirectory() as results_path:
+        constants.TIMELIMIT = 10
+        constants.RESULT_SINK = "sqlite"
+        constants.RESULTS_PATH = results_path
+        try:
+            data = DataMultipleProducts(
+                INSTANCE,
+                capacity_multiplier=1.1,
+                amount_of_end_products=1,
+                type_cap_ingredients="S",
+                coef_cap=1.1,
+            )
+            f1 = HighsFormulacao1(data, presolve=True, tight_big_m=True)
+            solution = solve_formulation(f1, phases=PhaseTimer())
+        finally:
+            constants.TIMELIMIT, constants.RESULT_SINK, constants.RESULTS_PATH = (
+                settings
+            )
+    if solution is None:
+        raise SystemExit("HiGHS found no solution without cplex")
+
+
+if __name__ == "__main__":
+    check_without_cplex()
+    print("main imports and HiGHS solves without cplex")
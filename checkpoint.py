@@ -0,0 +1,48 @@
+from typing import Dict, List
+
+from data import scenario_name
+
+COMPLETED_STATUS = ("OPTIMAL_SOLUTION", "FEASIBLE_SOLUTION")
+
+
+def scenario_key(
+    dataset: str,
+    end_products: int,
+    capmult,
+    type_cap_ingredients: str,
+    coef_cap,
+    random_demand=True,
+) -> str:
+    # same string DataMultipleProducts.__str__ gives the solved scenario
+    return scenario_name(
+        dataset.split(".")[0],
+        end_products,
+        capmult,
+        str.upper(type_cap_ingredients),
+        coef_cap,
+    )
+
+
+def is_completed(kpis: dict, rerun_gap_above=None, heuristic_only=False) -> bool:
+    # "infeasible" records mean no solution came back (error or time limit)
+    if kpis.get("status") not in COMPLETED_STATUS:
+        return False
+    # a heuristic-only run does not settle the scenario for the exact sweep
+    if kpis.get("Heuristic Only") and not heuristic_only:
+        return False
+    if rerun_gap_above is not None and kpis["status"] == "FEASIBLE_SOLUTION":
+        return not kpis.get("Gap", 0) > rerun_gap_above
+    return True
+
+
+def pending_scenarios(
+    iterator, records: Dict[str, dict], rerun_gap_above=None, heuristic_only=False
+) -> List[tuple]:
+    return [
+        scenario
+        for scenario in iterator
+        if scenario_key(*scenario) not in records
+        or not is_completed(
+            records[scenario_key(*scenario)], rerun_gap_above, heuristic_only
+        )
+    ]
@@ -2,8 +2,47 @@ DEFAULT_SINGLE_PRODUCTS = 1
 DEFAULT_TYPE_INGREDIENTS_CAPACITY = "W"
 CAPACITY_INGREDIENTS = ["W", "S"]
 TIMELIMIT = 180
+FORMULACAO = "formulacao1"  # ou "formulacao2" (localização de facilidades)
+SOLVER_BACKEND = "cplex"  # ou "highs" (open source, sem limite de licença)
+VECTORIZED_BUILD = True
+PRESOLVE_BLEND = True  # substitui p = ub * xE quando lb == ub
+TIGHT_BIG_M = True  # big-M dos setups limitados por capacidade e consumo restante
+SOLVER_KPIS = True  # False: KPIs calculados depois da solução, a partir das variáveis
+DEMAND_SEED = 0  # demanda aleatória por (instância, produtos); None: sem semente
+CAPACITY_SWEEP = True
+WARM_START = True
+LP_RELAXATION = True  # relaxação linear resolvida como LP em cópia do motor
+LS_CUTS = False  # separa desigualdades (l,S) por callback durante o branch-and-cut
+PRIMAL_HEURISTIC = False  # relax-and-fix + fix-and-optimize como MIP start
+HEURISTIC_ONLY = False  # varredura rápida: reporta só a solução heurística
+RELAX_AND_FIX_WINDOW = 4  # períodos binários por janela
+RELAX_AND_FIX_STEP = 2  # períodos fixados ao avançar a janela
+FIX_AND_OPTIMIZE_PASSES = 2
+HEURISTIC_TIMELIMIT = 10  # por subproblema
+HEURISTIC_BUDGET = 30  # todos os subproblemas juntos; descontado do TIMELIMIT
+DP_ENGINE = False  # Wagner-Whitin nos cenários W com um produto final
+SCENARIOS_PER_MODEL = 20  # None: um modelo por (instância, produtos, demanda)
 OTIMIZADOS_INDIVIDUAIS_PATH = "SOLUTION/INDIVIDUAIS/"
 FINAL_PATH = "SOLUTION/FINAL/"
+RESULTS_PATH = "SOLUTION/SHARDS/"
+RESULT_SINK = "sqlite"  # "xlsx": um arquivo por cenário em OTIMIZADOS_INDIVIDUAIS_PATH
+RESULT_BATCH_SIZE = 50
+EXCEL_EXPORT = True
+SAVE_SOLUTIONS = False  # valores das variáveis em .npz por cenário
+SOLUTIONS_PATH = "SOLUTION/VARIAVEIS/"
+LONGEST_JOB_FIRST = True
+HISTORY_PATTERN = f"{FINAL_PATH}*.xlsx"
+ADAPTIVE_THREADS = True
+MAX_THREADS = 8
+CORES_PER_NODE = None  # None: os.cpu_count() do nó
+RESUME = True  # pula cenários já concluídos no RESULTS_PATH
+RERUN_GAP_ABOVE = None  # ex.: 0.05 refaz cenários parados no tempo limite com gap maior
+INSTANCE_CACHE = False  # leitor dedicado é mais rápido que np.load
+INSTANCE_CACHE_PATH = "cache/instances/"
+MODEL_CACHE = False  # modelos vetorizados em .sav, lidos direto no CPLEX
+MODEL_CACHE_PATH = "cache/models/"
+MODEL_CACHE_SIZE = 4 * 1024**3  # bytes; remove os menos usados (LRU) ao passar
+SHARED_INSTANCES = True  # tabelas das instâncias em memória compartilhada
 END_PRODUCTS = [1, 5, 10]
 INSTANCES = ["2LLL1.DAT.dat"]
 INSTANCES = [f"{i}LLL{j}.DAT.dat" for i in [2, 5, 10] for j in range(1, 11)] + [
@@ -0,0 +1,160 @@
+import threading
+from typing import List, Tuple
+
+import numpy as np
+from numpy import ndarray
+
+TOLERANCE = 1e-6
+
+
+def cumulative_between(per_period: ndarray) -> ndarray:
+    # [n, t, l]: sum of per_period[n, t..l], zero for t > l
+    cumsum = np.cumsum(per_period, axis=1)
+    before = np.hstack([np.zeros((per_period.shape[0], 1)), cumsum[:, :-1]])
+    between = cumsum[:, np.newaxis, :] - before[:, :, np.newaxis]
+    return np.triu(between)
+
+
+def separate_ls(
+    x: ndarray,
+    y: ndarray,
+    s: ndarray,
+    b: ndarray,
+    demand_between: ndarray,
+    tolerance: float = TOLERANCE,
+) -> List[Tuple[int, int, ndarray]]:
+    """Most violated (l,S) inequality of each item and period l.
+
+    With backlog the inequality reads
+        sum_{t in S} x_t <= sum_{t in S} (d_tl y_t + b_{t-1}) + s_l,
+    where d_tl is the demand of t..l (an upper bound on it for ingredients).
+    For fixed l the best S holds every t <= l with a positive term, so
+    separation is O(T^2) per item. Returns (item, l, S as a boolean mask).
+    """
+    T = x.shape[1]
+    b_before = np.hstack([np.zeros((b.shape[0], 1)), b[:, :-1]])
+    terms = (
+        x[:, :, np.newaxis]
+        - demand_between * y[:, :, np.newaxis]
+        - b_before[:, :, np.newaxis]
+    )
+    in_s = (terms > tolerance) & np.triu(np.ones((T, T), dtype=bool))
+    violation = np.where(in_s, terms, 0).sum(axis=1) - s
+    scale = np.maximum(1, demand_between[:, 0, :])
+    return [
+        (n, l, in_s[n, :, l])
+        for n, l in zip(*np.nonzero(violation > tolerance * scale))
+    ]
+
+
+def ls_cut(
+    item: int,
+    l: int,
+    in_s: ndarray,
+    columns: dict,
+    demand_between: ndarray,
+):
+    import cplex
+
+    periods = np.flatnonzero(in_s)
+    ind = list(columns["x"][item, periods])
+    val = [1.0] * periods.size
+    ind += list(columns["y"][item, periods])
+    val += list(-demand_between[item, periods, l])
+    if "b" in columns:
+        backlogged = periods[periods > 0] - 1
+        ind += list(columns["b"][item, backlogged])
+        val += [-1.0] * backlogged.size
+    ind.append(columns["s"][item, l])
+    val.append(-1.0)
+    return cplex.SparsePair(ind=[int(i) for i in ind], val=val)
+
+
+def max_end_production(data) -> ndarray:
+    # per period: xE <= remaining demand * yE and production time fits capacity
+    remaining = data.sum_demand_end[:, :, 0].sum(axis=0)
+    if data.production_time_end[0] > 0:
+        return np.minimum(remaining, data.capacity / data.production_time_end[0])
+    return remaining
+
+
+class LSCutCallback(object):
+    """(l,S) inequalities of the end product and ingredient lot-sizing layers,
+    separated from the fractional points of the relaxation context."""
+
+    def __init__(self, f1) -> None:
+        data = f1.data
+        index = f1._column_index
+        self.end_products = {
+            "x": index["xE"],
+            "y": index["yE"],
+            "s": index["sE"],
+            "b": index["bE"],
+        }
+        self.ingredients = {"x": index["x"], "y": index["y"], "s": index["s"]}
+        self.end_demand = cumulative_between(data.demand_end)
+        self.ingredient_demand = cumulative_between(
+            np.outer(data.ub[:, 0], max_end_production(data))
+        )
+        self.cuts = 0
+        self.root_cuts = 0
+        self.root_bound_before = None
+        self._lock = threading.Lock()
+
+    def attach(self, mdl) -> None:
+        import cplex
+
+        mdl.get_cplex().set_callback(self, cplex.callbacks.Context.id.relaxation)
+
+    @staticmethod
+    def detach(mdl) -> None:
+        mdl.get_cplex().set_callback(None, 0)
+
+    def _separate(self, point: ndarray, columns: dict, demand_between: ndarray):
+        values = {name: point[cols] for name, cols in columns.items()}
+        b = values.get("b", np.zeros_like(values["s"]))
+        return [
+            ls_cut(item, l, in_s, columns, demand_between)
+            for item, l, in_s in separate_ls(
+                values["x"], values["y"], values["s"], b, demand_between
+            )
+        ]
+
+    def invoke(self, context) -> None:
+        import cplex
+
+        if not context.in_relaxation():
+            return
+        point = np.asarray(context.get_relaxation_point())
+        cuts = self._separate(point, self.end_products, self.end_demand)
+        cuts += self._separate(point, self.ingredients, self.ingredient_demand)
+        at_root = context.get_long_info(context.info.node_depth) == 0
+        with self._lock:
+            if at_root:
+                if self.root_bound_before is None:
+                    self.root_bound_before = context.get_relaxation_objective()
+                self.root_cuts += len(cuts)
+            self.cuts += len(cuts)
+        if cuts:
+            context.add_user_cuts(
+                cuts=cuts,
+                senses="L" * len(cuts),
+                rhs=[0.0] * len(cuts),
+                cutmanagement=[cplex.callbacks.UseCut.purge] * len(cuts),
+                local=[False] * len(cuts),
+            )
+
+    def kpis(self, objective_value: float, root_bound: float) -> dict:
+        # the callback only sees the relaxation before its own cuts: the bound
+        # after them is the solve's root bound
+        before, after = self.root_bound_before, root_bound
+        closed = None
+        if None not in (before, after) and objective_value - before > 0:
+            closed = (after - before) / (objective_value - before)
+        return {
+            "LS Cuts": self.cuts,
+            "LS Root Cuts": self.root_cuts,
+            "LS Root Bound Before": before,
+            "LS Root Bound After": after,
+            "LS Root Gap Closed": closed,
+        }
@@ -0,0 +1,84 @@
+from pathlib import Path
+
+import numpy as np
+from numpy import ndarray
+
+TABLE_WIDTH = 5
+HEADER_WIDTH = 3
+CAPACITY_WIDTH = 1
+END_PRODUCT_WIDTH = 5
+INGREDIENT_WIDTH = 3
+DEMAND_WIDTH = 1
+
+
+class DatFormatError(Exception):
+    pass
+
+
+def _tokens(f):
+    for lineno, line in enumerate(f, start=1):
+        tokens = line.split()
+        if tokens:
+            yield lineno, tokens
+
+
+def _expect(lines, width: int, section: str, path: Path) -> list:
+    try:
+        lineno, tokens = next(lines)
+    except StopIteration:
+        raise DatFormatError(
+            f"{path}: unexpected end of file, expected {section} line"
+        ) from None
+    if len(tokens) != width:
+        raise DatFormatError(
+            f"{path}:{lineno}: expected {width} values on {section} line, "
+            f"found {len(tokens)}"
+        )
+    try:
+        return [float(token) for token in tokens]
+    except ValueError:
+        raise DatFormatError(
+            f"{path}:{lineno}: non numeric value on {section} line: {' '.join(tokens)}"
+        ) from None
+
+
+def _dimension(value: float, name: str, path: Path) -> int:
+    if value != int(value) or value < 1:
+        raise DatFormatError(f"{path}:1: invalid number of {name} in header: {value}")
+    return int(value)
+
+
+def read_dat(path: Path) -> ndarray:
+    """Parse a lot-sizing .DAT.dat file into the table layout Data slices.
+
+    Rows: header (end products, ingredients, periods), capacity, one line per
+    end product, one per ingredient and one demand per period; columns past
+    each line's width are NaN.
+    """
+    path = Path(path)
+    with open(path, "r", encoding="utf-8") as f:
+        lines = _tokens(f)
+        header = _expect(lines, HEADER_WIDTH, "header", path)
+        end_products = _dimension(header[0], "end products", path)
+        ingredients = _dimension(header[1], "ingredients", path)
+        periods = _dimension(header[2], "periods", path)
+
+        table = np.full((2 + end_products + ingredients + periods, TABLE_WIDTH), np.nan)
+        table[0, :HEADER_WIDTH] = header
+        row = 1
+        for section, count, width in (
+            ("capacity", 1, CAPACITY_WIDTH),
+            ("end product", end_products, END_PRODUCT_WIDTH),
+            ("ingredient", ingredients, INGREDIENT_WIDTH),
+            ("demand", periods, DEMAND_WIDTH),
+        ):
+            for _ in range(count):
+                table[row, :width] = _expect(lines, width, section, path)
+                row += 1
+
+        extra = next(lines, None)
+        if extra is not None:
+            raise DatFormatError(
+                f"{path}:{extra[0]}: unexpected data after {periods} demand lines"
+            )
+    return table
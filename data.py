@@ -1,3 +1,5 @@
+import hashlib
+import zlib
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from typing import Any, Dict
@@ -6,7 +8,32 @@ import numpy as np
 from numpy import ndarray
 
 from constants import *
-from read_file import ReadData
+from instance_cache import load_instance
+
+
+def scenario_name(
+    instance: str,
+    amount_of_end_products: int,
+    capacity_multiplier,
+    type_cap_ingredients: str,
+    coef_cap,
+) -> str:
+    return f"{instance}_prod_{amount_of_end_products}_capE_{capacity_multiplier}_capI_{type_cap_ingredients}_coefCap_{coef_cap}"
+
+
+def demand_generator(instance: str, amount_of_end_products: int):
+    # same draw for an (instance, end products) group in every run and worker:
+    # resumed sweeps see the same demand and find their cached models again
+    if DEMAND_SEED is None:
+        return np.random
+    return np.random.default_rng(
+        [DEMAND_SEED, zlib.crc32(instance.encode()), amount_of_end_products]
+    )
+
+
+def suffix_sums(demand: ndarray) -> ndarray:
+    # demand from each period to the horizon, along the last axis
+    return np.cumsum(demand[..., ::-1], axis=-1)[..., ::-1]
 
 
 class DataAbstractClass(ABC):
@@ -50,7 +77,7 @@ class Data(DataAbstractClass):
         return f"{self.instance}"
 
     def __init__(self, file_to_read: str, capacity_multiplier=1):
-        df = ReadData(file_to_read).get_df()
+        table = load_instance(file_to_read)
         self.file_to_read = file_to_read
         self.instance = self.file_to_read.split(".")[0]
         self.ingredient_capacity = [np.inf]
@@ -60,47 +87,45 @@ class Data(DataAbstractClass):
             DEFAULT_SINGLE_PRODUCTS
         )  # Original instances are single end product
         self.amount_of_end_products = self.END_PRODUCTS.shape[0]
-        self.INGREDIENTS = np.arange(int(df.iloc[0, 1]))
-        self.PERIODS = np.arange(int(df.iloc[0, 2]))
+        self.INGREDIENTS = np.arange(int(table[0, 1]))
+        self.PERIODS = np.arange(int(table[0, 2]))
         inicio = 1
         fim = inicio + 1
-        self._capacity_end = (
-            np.array(df.iloc[inicio:fim, 0].astype(float), dtype=int)
-            * capacity_multiplier
-        )
+        self._base_capacity_end = np.array(table[inicio:fim, 0], dtype=int)
+        self._capacity_end = self._base_capacity_end * capacity_multiplier
         self.capacity_multiplier = capacity_multiplier
         self.capacity = self._capacity_end[0] * self.amount_of_end_products
         inicio, fim = fim, fim + self.END_PRODUCTS.shape[0]
-        self.production_time_end = np.array(
-            df.iloc[inicio:fim, 0].astype(float),
+        self.production_time_end = np.asarray(
+            table[inicio:fim, 0],
         )
-        self.holding_cost_end = np.array(
-            df.iloc[inicio:fim, 1].astype(float),
+        self.holding_cost_end = np.asarray(
+            table[inicio:fim, 1],
         )
-        self.setup_time_end = np.array(
-            df.iloc[inicio:fim, 2].astype(float),
+        self.setup_time_end = np.asarray(
+            table[inicio:fim, 2],
         )
-        self.setup_cost_end = np.array(
-            df.iloc[inicio:fim, 3].astype(float),
+        self.setup_cost_end = np.asarray(
+            table[inicio:fim, 3],
         )
-        self.production_cost_end = np.array(
-            df.iloc[inicio:fim, 4].astype(float),
+        self.production_cost_end = np.asarray(
+            table[inicio:fim, 4],
         )
         inicio, fim = fim, fim + self.INGREDIENTS.shape[0]
-        self.holding_cost_ingredient = np.array(
-            df.iloc[inicio:fim, 0].astype(float),
+        self.holding_cost_ingredient = np.asarray(
+            table[inicio:fim, 0],
         )
-        self.setup_cost_ingredient = np.array(
-            df.iloc[inicio:fim, 1].astype(float),
+        self.setup_cost_ingredient = np.asarray(
+            table[inicio:fim, 1],
         )
-        self.production_cost_ingredient = np.array(
-            df.iloc[inicio:fim, 2].astype(float),
+        self.production_cost_ingredient = np.asarray(
+            table[inicio:fim, 2],
         )
         inicio, fim = fim, fim + self.PERIODS.shape[0]
-        self.demand_end = np.array(df.iloc[inicio:fim, 0].astype(float), dtype=int)
-        self.sum_demand_end = np.array(
-            list(self.demand_end[t:].sum() for t in self.PERIODS)
-        ).reshape(self.END_PRODUCTS.shape[0], self.PERIODS.shape[0], 1)
+        self.demand_end = np.array(table[inicio:fim, 0], dtype=int)
+        self.sum_demand_end = suffix_sums(self.demand_end).reshape(
+            self.END_PRODUCTS.shape[0], self.PERIODS.shape[0], 1
+        )
         self._define_limits()
 
     def _define_limits(self):
@@ -117,7 +142,13 @@ class Data(DataAbstractClass):
 class DataMultipleProducts(Data):
 
     def __str__(self):
-        return f"{super().__str__()}_prod_{self.END_PRODUCTS.shape[0]}_capE_{self.capacity_multiplier}_capI_{self.type_cap_ingredients}_coefCap_{self.coef_cap}"
+        return scenario_name(
+            super().__str__(),
+            self.END_PRODUCTS.shape[0],
+            self.capacity_multiplier,
+            self.type_cap_ingredients,
+            self.coef_cap,
+        )
 
     def __init__(
         self,
@@ -138,6 +169,40 @@ class DataMultipleProducts(Data):
         self._define_limits()
         self._update_ingredient_capacity(str.upper(type_cap_ingredients))
 
+    def update_capacities(
+        self, capacity_multiplier, type_cap_ingredients: str, coef_cap: float
+    ):
+        self._capacity_end = self._base_capacity_end * capacity_multiplier
+        self.capacity_multiplier = capacity_multiplier
+        self.type_cap_ingredients = str.upper(type_cap_ingredients)
+        self.coef_cap = coef_cap
+        self._update_end_products_capacity()
+        self._update_ingredient_capacity(self.type_cap_ingredients)
+
+    def canonical_key(self, capacities: bool = True) -> str:
+        # hash of everything the model is built from, labels left out;
+        # without capacities: the part update_capacities does not rewrite
+        digest = hashlib.sha1()
+        for values in (
+            self.demand_end,
+            self.sum_demand_end,
+            self.holding_cost_end,
+            self.setup_cost_end,
+            self.production_cost_end,
+            self.production_time_end,
+            self.setup_time_end,
+            self.holding_cost_ingredient,
+            self.setup_cost_ingredient,
+            self.production_cost_ingredient,
+            self.ub,
+            self.lb,
+            *((self.capacity, self.ingredient_capacity[0]) if capacities else ()),
+        ):
+            values = np.ascontiguousarray(values, dtype=float)
+            digest.update(str(values.shape).encode())
+            digest.update(values.tobytes())
+        return digest.hexdigest()
+
     def _update_end_products_capacity(self):
         self.capacity = self._capacity_end[0] * self.END_PRODUCTS.shape[0]
 
@@ -150,7 +215,9 @@ class DataMultipleProducts(Data):
                 axis=1,
             ).T
         elif self._random_demand and self.END_PRODUCTS.shape[0] > 1:
-            self.demand_end = np.random.uniform(
+            self.demand_end = demand_generator(
+                self.instance, self.END_PRODUCTS.shape[0]
+            ).uniform(
                 low=500,
                 high=1500,
                 size=(self.END_PRODUCTS.shape[0], self.PERIODS.shape[0]),
@@ -158,12 +225,7 @@ class DataMultipleProducts(Data):
         else:
             raise Exception("Invalid parameters to random demand.")
         self._original_sum_demanda_product = self.sum_demand_end
-        sum_demand_product = []
-        for k in self.END_PRODUCTS:
-            sum_demand_product.append(
-                np.array(list(self.demand_end[k][t:].sum() for t in self.PERIODS))
-            )
-        self.sum_demand_end = np.array(sum_demand_product).reshape(
+        self.sum_demand_end = suffix_sums(self.demand_end).reshape(
             self.END_PRODUCTS.shape[0], self.PERIODS.shape[0], 1
         )
         self.amount_of_end_products = self.END_PRODUCTS.shape[0]
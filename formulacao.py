@@ -1,25 +1,93 @@
+from functools import wraps
+from typing import Dict, Optional
+
+import numpy as np
 from docplex.mp.model import Model
 
-from data import Data, DataMultipleProducts, MockData
+import matrix_builder
+import model_cache
+from data import DataMultipleProducts
+from kpis import backlog_cost
 from utils import extract_variables
 
+CPLEX_SENSES = {"le": "L", "ge": "G", "eq": "E"}
+
+
+def cached_expression(method):
+    # each cost expression is built once, then shared by KPIs and objective
+    @wraps(method)
+    def wrapper(self):
+        expressions = self.__dict__.setdefault("_expressions", {})
+        if method.__name__ not in expressions:
+            expressions[method.__name__] = method(self)
+        return expressions[method.__name__]
+
+    return wrapper
+
 
 class Formulacao1:
-    def __init__(self, data: DataMultipleProducts):
+    name = "formulacao1"
+    backend = "cplex"
+    cached_rows = model_cache.CACHED_ROWS
+
+    def __init__(
+        self,
+        data: DataMultipleProducts,
+        vectorized: bool = False,
+        presolve: bool = False,
+        tight_big_m: bool = False,
+        solver_kpis: bool = True,
+        model_cache_path: Optional[str] = None,
+    ):
         self.data = data
-        self.model = Model()
+        self.vectorized = vectorized
+        self.tight_big_m = tight_big_m
+        # False: KPIs computed from the extracted solution, see kpis.py
+        self.solver_kpis = solver_kpis
+        # lb == ub pins p[i, k, t] to ub[i] * xE[k, t]: substituted out
+        self.substitute_proportions = presolve and matrix_builder.fixed_blend(data)
+        self.model = self.new_model()
         self.build_variables()
+        # cache only for the vectorized build: its rows live in the engine alone
+        use_cache = self.vectorized and model_cache_path is not None
+        self.from_cache = use_cache and model_cache.load_model(self, model_cache_path)
+        if self.from_cache:
+            # cached with the capacities of the scenario that built it
+            self._set_capacity_rows()
+        else:
+            self.build_constraints()
+
+        if self.solver_kpis:
+            self._add_kpis()
+
+        self.set_objective()
+        if use_cache and not self.from_cache:
+            model_cache.store_model(self, model_cache_path)
+
+    def new_model(self):
+        return Model()
+
+    def set_objective(self):
+        self.model.minimize(self.end_products_cost() + self.ingredients_cost())
+
+    def set_parameters(self, timelimit: float, threads: int, mipgap: float = None):
+        self.model.set_time_limit(timelimit)
+        self.model.context.cplex_parameters.threads = threads
+        if mipgap is not None:
+            self.model.parameters.mip.tolerances.mipgap = mipgap
 
+    def build_constraints(self):
         self.balance_inventory_end_products_constraint()
         self.setup_end_products_constraint()
-        self.capacity_end_products_constraint()
-        self.capacity_ingredients_constraint()
+        self._capacity_end_products_cts = self.capacity_end_products_constraint()
+        self._capacity_ingredients_cts = self.capacity_ingredients_constraint()
         self.balance_inventory_ingredients_constraint()
         self.setup_ingredients_constraint()
         self.upper_ingredients_constraint()
         self.lower_ingredients_constraint()
         self.total_proportion_end_products_constraint()
 
+    def _add_kpis(self):
         self.model.add_kpi(
             self.setup_cost_end_products(), publish_name="setup_cost_end_products"
         )
@@ -55,6 +123,9 @@ class Formulacao1:
             publish_name="total_backlogged_end_products",
         )
 
+        self._add_utilization_capacity_kpis()
+
+    def _add_utilization_capacity_kpis(self):
         self.model.add_kpi(
             self.get_end_product_utilization_capacity(), publish_name="end_product_uc"
         )
@@ -63,7 +134,54 @@ class Formulacao1:
             self.get_ingredients_utilization_capacity(), publish_name="ingredients_uc"
         )
 
-        self.model.minimize(self.end_products_cost() + self.ingredients_cost())
+    def update_capacities(
+        self, capacity_multiplier, type_cap_ingredients: str, coef_cap: float
+    ):
+        # only the capacity right-hand sides and the utilization KPIs change
+        self.data.update_capacities(capacity_multiplier, type_cap_ingredients, coef_cap)
+        self._set_capacity_rows()
+        if self.solver_kpis:
+            self.model.remove_kpi("end_product_uc")
+            self.model.remove_kpi("ingredients_uc")
+            self._add_utilization_capacity_kpis()
+
+    def _set_capacity_rows(self):
+        self._set_rhs(self._capacity_end_products_cts, self.data.capacity)
+        self._set_rhs(self._capacity_ingredients_cts, self.data.ingredient_capacity[0])
+        if self.tight_big_m:
+            self._set_big_m(
+                self._setup_end_products_cts,
+                self.setup_end_products,
+                matrix_builder.setup_big_m_end_products(self.data, tight=True),
+            )
+            self._set_big_m(
+                self._setup_ingredients_cts,
+                self.setup_ingredients,
+                matrix_builder.setup_big_m_ingredients(self.data, tight=True),
+            )
+
+    def _set_big_m(self, cts, setups, big_m):
+        # rows and setups both ordered (item, t)
+        if self.vectorized:
+            self.model.get_cplex().linear_constraints.set_coefficients(
+                [
+                    (ct, var.index, -float(m))
+                    for ct, var, m in zip(cts, setups.values(), big_m.ravel())
+                ]
+            )
+        else:
+            for ct, var, m in zip(cts, setups.values(), big_m.ravel()):
+                ct.right_expr = m * var
+
+    def _set_rhs(self, cts, value):
+        if self.vectorized:
+            value = float(np.clip(value, -self.model.infinity, self.model.infinity))
+            self.model.get_cplex().linear_constraints.set_rhs(
+                [(ct, value) for ct in cts]
+            )
+        else:
+            for ct in cts:
+                ct.rhs = value
 
     def build_variables(self):
         self._build_end_products_var()
@@ -74,6 +192,28 @@ class Formulacao1:
         self._build_ingredients_var()
         self._build_setup_ingredients_var()
         self._build_inventory_ingredients_var()
+        self._column_index = matrix_builder.ColumnIndex(
+            self.data, proportions=not self.substitute_proportions
+        )
+
+    def _add_matrix_constraints(self, blocks):
+        # rows go straight to the CPLEX engine in a single call per family,
+        # docplex only keeps the variables, objective and KPIs
+        lin_expr, senses, rhs = [], [], []
+        for block in blocks:
+            bounds = np.searchsorted(block.rows, np.arange(block.number_of_rows + 1))
+            for start, end in zip(bounds[:-1], bounds[1:]):
+                lin_expr.append(
+                    [block.cols[start:end].tolist(), block.vals[start:end].tolist()]
+                )
+            senses.extend(CPLEX_SENSES[block.sense] * block.number_of_rows)
+            rhs.extend(
+                np.clip(block.rhs, -self.model.infinity, self.model.infinity).tolist()
+            )
+        cpx = self.model.get_cplex()
+        first = cpx.linear_constraints.get_num()
+        cpx.linear_constraints.add(lin_expr=lin_expr, senses=senses, rhs=rhs)
+        return list(range(first, first + len(rhs)))
 
     def _build_end_products_var(self):
         self.end_products = self.model.continuous_var_matrix(
@@ -104,6 +244,18 @@ class Formulacao1:
         )
 
     def _build_ingredient_proportion_var(self):
+        if self.substitute_proportions:
+            if self.vectorized:
+                # the matrix blocks use ub * xE directly
+                self.ingredient_proportion = {}
+                return
+            self.ingredient_proportion = {
+                (i, k, t): self.data.ub[i, 0] * self.end_products[k, t]
+                for i in self.data.INGREDIENTS
+                for k in self.data.END_PRODUCTS
+                for t in self.data.PERIODS
+            }
+            return
         self.ingredient_proportion = self.model.continuous_var_cube(
             self.data.INGREDIENTS.shape[0],
             self.data.END_PRODUCTS.shape[0],
@@ -133,6 +285,12 @@ class Formulacao1:
         )
 
     def balance_inventory_end_products_constraint(self):
+        if self.vectorized:
+            return self._add_matrix_constraints(
+                matrix_builder.balance_inventory_end_products(
+                    self.data, self._column_index
+                )
+            )
         self.model.add_constraints(
             self.end_products[k, 0] + self.backlogged_end_products[k, 0]
             == self.data.demand_end[k, 0] + self.inventory_end_products[k, 0]
@@ -151,15 +309,25 @@ class Formulacao1:
         )
 
     def setup_end_products_constraint(self):
-        self.model.add_constraints(
-            self.end_products[k, t]
-            <= self.data.sum_demand_end[k, t, 0] * self.setup_end_products[k, t]
+        # kept for update_capacities: tight big-Ms depend on the capacity
+        big_m = matrix_builder.setup_big_m_end_products(self.data, self.tight_big_m)
+        if self.vectorized:
+            self._setup_end_products_cts = self._add_matrix_constraints(
+                matrix_builder.setup_end_products(self.data, self._column_index, big_m)
+            )
+            return self._setup_end_products_cts
+        self._setup_end_products_cts = self.model.add_constraints(
+            self.end_products[k, t] <= big_m[k, t] * self.setup_end_products[k, t]
             for k in self.data.END_PRODUCTS
             for t in self.data.PERIODS
         )
 
     def capacity_end_products_constraint(self):
-        self.model.add_constraints(
+        if self.vectorized:
+            return self._add_matrix_constraints(
+                matrix_builder.capacity_end_products(self.data, self._column_index)
+            )
+        return self.model.add_constraints(
             self.model.sum(
                 self.data.setup_time_end[0] * self.setup_end_products[k, t]
                 + self.data.production_time_end[0] * self.end_products[k, t]
@@ -170,15 +338,25 @@ class Formulacao1:
         )
 
     def capacity_ingredients_constraint(self):
+        if self.vectorized:
+            return self._add_matrix_constraints(
+                matrix_builder.capacity_ingredients(self.data, self._column_index)
+            )
         # todo: add tempo setup ingrediente
         # todo: add tempo producao ingrediente
-        self.model.add_constraints(
+        return self.model.add_constraints(
             self.ingredients[i, t] <= self.data.ingredient_capacity[0]
             for i in self.data.INGREDIENTS
             for t in self.data.PERIODS
         )
 
     def balance_inventory_ingredients_constraint(self):
+        if self.vectorized:
+            return self._add_matrix_constraints(
+                matrix_builder.balance_inventory_ingredients(
+                    self.data, self._column_index
+                )
+            )
         self.model.add_constraints(
             self.ingredients[i, 0]
             == self.model.sum(
@@ -199,20 +377,26 @@ class Formulacao1:
         )
 
     def setup_ingredients_constraint(self):
-        self.model.add_constraints(
-            self.ingredients[i, t]
-            <= self.model.sum(
-                self.data.ub[i, 0] for k in self.data.END_PRODUCTS
-            )  # fix: ub needs to change between products
-            * self.model.sum(
-                self.data.sum_demand_end[k, t, 0] for k in self.data.END_PRODUCTS
+        # fix: ub needs to change between products
+        big_m = matrix_builder.setup_big_m_ingredients(self.data, self.tight_big_m)
+        if self.vectorized:
+            self._setup_ingredients_cts = self._add_matrix_constraints(
+                matrix_builder.setup_ingredients(self.data, self._column_index, big_m)
             )
-            * self.setup_ingredients[i, t]
+            return self._setup_ingredients_cts
+        self._setup_ingredients_cts = self.model.add_constraints(
+            self.ingredients[i, t] <= big_m[i, t] * self.setup_ingredients[i, t]
             for i in self.data.INGREDIENTS
             for t in self.data.PERIODS
         )
 
     def upper_ingredients_constraint(self):
+        if self.substitute_proportions:
+            return
+        if self.vectorized:
+            return self._add_matrix_constraints(
+                matrix_builder.upper_ingredients(self.data, self._column_index)
+            )
         self.model.add_constraints(
             self.ingredient_proportion[i, k, t]
             <= self.data.ub[i, 0] * self.end_products[k, t]
@@ -222,6 +406,12 @@ class Formulacao1:
         )
 
     def lower_ingredients_constraint(self):
+        if self.substitute_proportions:
+            return
+        if self.vectorized:
+            return self._add_matrix_constraints(
+                matrix_builder.lower_ingredients(self.data, self._column_index)
+            )
         self.model.add_constraints(
             self.ingredient_proportion[i, k, t]
             >= self.data.lb[i, 0] * self.end_products[k, t]
@@ -231,6 +421,14 @@ class Formulacao1:
         )
 
     def total_proportion_end_products_constraint(self):
+        if self.vectorized:
+            return self._add_matrix_constraints(
+                matrix_builder.total_proportion_end_products(
+                    self.data, self._column_index
+                )
+            )
+        if self.substitute_proportions and np.isclose(self.data.ub[:, 0].sum(), 1):
+            return
         self.model.add_constraints(
             self.model.sum(
                 self.ingredient_proportion[i, k, t] for i in self.data.INGREDIENTS
@@ -240,100 +438,255 @@ class Formulacao1:
             for t in self.data.PERIODS
         )
 
+    @cached_expression
     def setup_cost_end_products(self):
-        return self.model.sum(
-            self.data.setup_cost_end[0] * self.setup_end_products[k, t]
-            for k in self.data.END_PRODUCTS
-            for t in self.data.PERIODS
+        return self.data.setup_cost_end[0] * self.model.sum_vars(
+            self.setup_end_products.values()
         )
 
+    @cached_expression
     def production_cost_end_products(self):
-        return self.model.sum(
-            self.data.production_cost_end[0] * self.end_products[k, t]
-            for k in self.data.END_PRODUCTS
-            for t in self.data.PERIODS
+        return self.data.production_cost_end[0] * self.model.sum_vars(
+            self.end_products.values()
         )
 
+    @cached_expression
     def holding_cost_end_products(self):
-        return self.model.sum(
-            self.data.holding_cost_end[0] * self.inventory_end_products[k, t]
-            for k in self.data.END_PRODUCTS
-            for t in self.data.PERIODS
+        return self.data.holding_cost_end[0] * self.model.sum_vars(
+            self.inventory_end_products.values()
         )
 
+    @cached_expression
     def end_products_cost(self):
-        return (
-            self.setup_cost_end_products()
-            + self.production_cost_end_products()
-            + self.holding_cost_end_products()
+        return self.model.sum(
+            [
+                self.setup_cost_end_products(),
+                self.production_cost_end_products(),
+                self.holding_cost_end_products(),
+            ]
         )
 
+    def _ingredients_scal_prod(self, variables, cost):
+        # variables ordered (i, t): cost repeated over the periods
+        return self.model.scal_prod(
+            list(variables.values()), np.repeat(cost, len(self.data.PERIODS))
+        )
+
+    @cached_expression
     def setup_cost_ingredients(self):
-        return self.model.sum(
-            self.data.setup_cost_ingredient[i] * self.setup_ingredients[i, t]
-            for i in self.data.INGREDIENTS
-            for t in self.data.PERIODS
+        return self._ingredients_scal_prod(
+            self.setup_ingredients, self.data.setup_cost_ingredient
         )
 
+    @cached_expression
     def production_cost_ingredients(self):
-        return self.model.sum(
-            self.data.production_cost_ingredient[i] * self.ingredients[i, t]
-            for i in self.data.INGREDIENTS
-            for t in self.data.PERIODS
+        return self._ingredients_scal_prod(
+            self.ingredients, self.data.production_cost_ingredient
         )
 
+    @cached_expression
     def holding_cost_end_ingredients(self):
-        return self.model.sum(
-            self.data.holding_cost_ingredient[i] * self.inventory_ingredients[i, t]
-            for i in self.data.INGREDIENTS
-            for t in self.data.PERIODS
+        return self._ingredients_scal_prod(
+            self.inventory_ingredients, self.data.holding_cost_ingredient
         )
 
+    @cached_expression
     def ingredients_cost(self):
-        return (
-            self.setup_cost_ingredients()
-            + self.production_cost_ingredients()
-            + self.holding_cost_end_ingredients()
-            + self.backlogged_end_products_cost()
+        return self.model.sum(
+            [
+                self.setup_cost_ingredients(),
+                self.production_cost_ingredients(),
+                self.holding_cost_end_ingredients(),
+                self.backlogged_end_products_cost(),
+            ]
         )
 
+    @cached_expression
     def backlogged_end_products_cost(self):
-        return (
-            100
-            * max(self.data.holding_cost_end[0], self.data.setup_cost_end[0])
-            * self.model.sum(
-                self.backlogged_end_products[k, t]
-                for k in self.data.END_PRODUCTS
-                for t in self.data.PERIODS
-            )
+        return backlog_cost(self.data) * self.total_backlogged_end_products()
+
+    @cached_expression
+    def _end_product_usage(self):
+        return self.data.setup_time_end[0] * self.model.sum_vars(
+            self.setup_end_products.values()
+        ) + self.data.production_time_end[0] * self.model.sum_vars(
+            self.end_products.values()
         )
 
+    @cached_expression
+    def _ingredient_usage(self):
+        return self.model.sum_vars(self.ingredients.values())
+
     def get_end_product_utilization_capacity(self):
-        return sum(
-            self.setup_end_products[k, t] * self.data.setup_time_end[0]
-            + self.end_products[k, t] * self.data.production_time_end[0]
-            for k in self.data.END_PRODUCTS
-            for t in self.data.PERIODS
-        ) / (self.data.capacity * len(self.data.PERIODS))
+        # the capacities change between sweeps, the usage does not
+        return self._end_product_usage() / (self.data.capacity * len(self.data.PERIODS))
 
     def get_ingredients_utilization_capacity(self):
-        return sum(
-            self.ingredients[i, t]
-            for i in self.data.INGREDIENTS
-            for t in self.data.PERIODS
-        ) / (
+        return self._ingredient_usage() / (
             self.data.ingredient_capacity[0]
             * len(self.data.PERIODS)
             * len(self.data.INGREDIENTS)
         )
 
+    @cached_expression
     def total_backlogged_end_products(self):
-        return self.model.sum(
-            self.backlogged_end_products[k, t]
+        return self.model.sum_vars(self.backlogged_end_products.values())
+
+
+class Formulacao2(Formulacao1):
+    """Facility location reformulation on top of Formulacao1.
+
+    Production is split by the period whose demand it serves, end products
+    in w[k, s, t] (s > t is backlog, u[k, t] is demand never served) and
+    ingredients in v[i, s, t]. Inventories, backlogs and productions become
+    sums of these transfers, each transfer bounded by the demand it serves
+    times the setup of the period it is produced in. Formulacao1's setup
+    constraints are kept, so both models have the same optimum and the
+    original variables, KPIs and capacity updates are unchanged.
+    """
+
+    name = "formulacao2"
+    cached_rows = Formulacao1.cached_rows + ("_transfer_setup_ingredients_cts",)
+
+    def build_variables(self):
+        super().build_variables()
+        K = self.data.END_PRODUCTS.shape[0]
+        I = self.data.INGREDIENTS.shape[0]
+        T = self.data.PERIODS.shape[0]
+        self.end_products_transfer = self.model.continuous_var_cube(K, T, T, name="w")
+        self.unserved_demand = self.model.continuous_var_matrix(K, T, name="u")
+        self.ingredients_transfer = self.model.continuous_var_cube(I, T, T, name="v")
+        # ingredients are never backlogged
+        self.model.change_var_upper_bounds(
+            [var for (i, s, t), var in self.ingredients_transfer.items() if s > t],
+            0,
+        )
+        self._column_index.add("w", (K, T, T))
+        self._column_index.add("u", (K, T))
+        self._column_index.add("v", (I, T, T))
+
+    def balance_inventory_end_products_constraint(self):
+        if self.vectorized:
+            return self._add_matrix_constraints(
+                matrix_builder.facility_location_end_products(
+                    self.data, self._column_index
+                )
+            )
+        w = self.end_products_transfer
+        u = self.unserved_demand
+        P = self.data.PERIODS
+        self.model.add_constraints(
+            self.model.sum(w[k, s, t] for s in P) + u[k, t]
+            == self.data.demand_end[k, t]
+            for k in self.data.END_PRODUCTS
+            for t in P
+        )
+        self.model.add_constraints(
+            self.end_products[k, s] == self.model.sum(w[k, s, t] for t in P)
+            for k in self.data.END_PRODUCTS
+            for s in P
+        )
+        self.model.add_constraints(
+            self.inventory_end_products[k, r]
+            == self.model.sum(w[k, s, t] for s in P for t in P if s <= r < t)
             for k in self.data.END_PRODUCTS
+            for r in P
+        )
+        self.model.add_constraints(
+            self.backlogged_end_products[k, r]
+            == self.model.sum(w[k, s, t] for s in P for t in P if t <= r < s)
+            + self.model.sum(u[k, t] for t in P if t <= r)
+            for k in self.data.END_PRODUCTS
+            for r in P
+        )
+
+    def setup_end_products_constraint(self):
+        super().setup_end_products_constraint()
+        if self.vectorized:
+            return self._add_matrix_constraints(
+                matrix_builder.facility_location_setup_end_products(
+                    self.data, self._column_index
+                )
+            )
+        self.model.add_constraints(
+            self.end_products_transfer[k, s, t]
+            <= self.data.demand_end[k, t] * self.setup_end_products[k, s]
+            for k in self.data.END_PRODUCTS
+            for s in self.data.PERIODS
             for t in self.data.PERIODS
         )
 
+    def balance_inventory_ingredients_constraint(self):
+        if self.vectorized:
+            return self._add_matrix_constraints(
+                matrix_builder.facility_location_ingredients(
+                    self.data, self._column_index
+                )
+            )
+        v = self.ingredients_transfer
+        P = self.data.PERIODS
+        self.model.add_constraints(
+            self.model.sum(v[i, s, t] for s in P if s <= t)
+            == self.model.sum(
+                self.ingredient_proportion[i, k, t] for k in self.data.END_PRODUCTS
+            )
+            for i in self.data.INGREDIENTS
+            for t in P
+        )
+        self.model.add_constraints(
+            self.ingredients[i, s] == self.model.sum(v[i, s, t] for t in P if t >= s)
+            for i in self.data.INGREDIENTS
+            for s in P
+        )
+        self.model.add_constraints(
+            self.inventory_ingredients[i, r]
+            == self.model.sum(v[i, s, t] for s in P for t in P if s <= r < t)
+            for i in self.data.INGREDIENTS
+            for r in P
+        )
+
+    def setup_ingredients_constraint(self):
+        super().setup_ingredients_constraint()
+        # kept for update_capacities, as the rows of Formulacao1
+        big_m = matrix_builder.facility_location_big_m_ingredients(
+            self.data, self.tight_big_m
+        )
+        if self.vectorized:
+            self._transfer_setup_ingredients_cts = self._add_matrix_constraints(
+                matrix_builder.facility_location_setup_ingredients(
+                    self.data, self._column_index, big_m
+                )
+            )
+            return self._transfer_setup_ingredients_cts
+        self._transfer_setup_ingredients_cts = self.model.add_constraints(
+            self.ingredients_transfer[i, s, t]
+            <= big_m[i, t] * self.setup_ingredients[i, s]
+            for i, s, t in self._transfer_setups()
+        )
+
+    def _transfer_setups(self) -> Dict[tuple, object]:
+        # setup of the production period of each v[i, s, t], s <= t
+        T = self.data.PERIODS.shape[0]
+        return {
+            (i, s, t): self.setup_ingredients[i, s]
+            for i in self.data.INGREDIENTS
+            for s in range(T)
+            for t in range(s, T)
+        }
+
+    def _set_capacity_rows(self):
+        super()._set_capacity_rows()
+        if self.tight_big_m:
+            setups = self._transfer_setups()
+            big_m = matrix_builder.facility_location_big_m_ingredients(
+                self.data, tight=True
+            )
+            self._set_big_m(
+                self._transfer_setup_ingredients_cts,
+                setups,
+                np.array([big_m[i, t] for i, _, t in setups]),
+            )
+
 
 if __name__ == "__main__":
     data = DataMultipleProducts(
@@ -351,15 +704,5 @@ if __name__ == "__main__":
     f1.model.print_solution()
     print(f1.model.solve_status)
 
-    produto_periodo = ["produto", "periodo"]
-    ingrediente_produto_periodo = ["ingrediente"] + produto_periodo
-    ingrediente_periodo = ["ingrediente", "periodo"]
-
-    var_results = extract_variables(
-        f1.model,
-        f1,
-        produto_periodo=produto_periodo,
-        ingrediente_produto_periodo=ingrediente_produto_periodo,
-        ingrediente_periodo=ingrediente_periodo,
-    )
+    var_results = extract_variables(f1.model, f1, long_format=True)
     pass
@@ -0,0 +1,157 @@
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional
+
+import numpy as np
+from docplex.mp.constants import EffortLevel
+from numpy import ndarray
+
+import constants
+
+if TYPE_CHECKING:
+    import cplex
+
+
+@dataclass
+class HeuristicSolution:
+    values: ndarray  # one value per engine column
+    objective_value: float
+    time: float
+
+
+def subproblem_engine(mdl, threads: int = 1) -> "cplex.Cplex":
+    import cplex
+
+    # cópia do motor: restrições montadas em bloco não existem no modelo docplex
+    cpx = cplex.Cplex(mdl.get_cplex())
+    cpx.set_log_stream(None)
+    cpx.set_results_stream(None)
+    cpx.set_warning_stream(None)
+    cpx.parameters.threads.set(threads)
+    return cpx
+
+
+def setup_columns(f1) -> ndarray:
+    # [item, t]: end product setups followed by ingredient setups
+    index = f1._column_index
+    return np.vstack([index["yE"], index["y"]])
+
+
+def _set_bounds(cpx: "cplex.Cplex", cols: ndarray, lb, ub) -> None:
+    if cols.size == 0:
+        return
+    cols = cols.tolist()
+    lb = np.broadcast_to(lb, len(cols)).tolist()
+    ub = np.broadcast_to(ub, len(cols)).tolist()
+    cpx.variables.set_lower_bounds(list(zip(cols, lb)))
+    cpx.variables.set_upper_bounds(list(zip(cols, ub)))
+
+
+def _set_types(cpx: "cplex.Cplex", cols: ndarray, ctype: str) -> None:
+    if cols.size:
+        cpx.variables.set_types([(int(j), ctype) for j in cols])
+
+
+def _solve(cpx: "cplex.Cplex", deadline: float) -> Optional[ndarray]:
+    # each subproblem capped, and all of them together by the budget
+    remaining = deadline - time.time()
+    if remaining <= 0:
+        return None
+    cpx.parameters.timelimit.set(min(constants.HEURISTIC_TIMELIMIT, remaining))
+    cpx.solve()
+    if not cpx.solution.is_primal_feasible():
+        return None
+    return np.asarray(cpx.solution.get_values())
+
+
+def relax_and_fix(
+    cpx: "cplex.Cplex", setups: ndarray, window: int, step: int, deadline: float
+) -> Optional[ndarray]:
+    """Setups of the periods in the window stay binary, later ones are
+    relaxed and the first `step` periods are fixed before moving on. None
+    when a window is infeasible or the budget ends first."""
+    T = setups.shape[1]
+    _set_types(cpx, setups[:, window:].ravel(), cpx.variables.type.continuous)
+    for start in range(0, T, step):
+        _set_types(
+            cpx, setups[:, start : start + window].ravel(), cpx.variables.type.binary
+        )
+        values = _solve(cpx, deadline)
+        if values is None or start + window >= T:
+            return values
+        fixed = setups[:, start : start + step].ravel()
+        rounded = np.round(values[fixed])
+        _set_bounds(cpx, fixed, rounded, rounded)
+    return values
+
+
+def fix_and_optimize(
+    cpx: "cplex.Cplex", setups: ndarray, values: ndarray, passes: int, deadline: float
+) -> ndarray:
+    """Frees the setups of one item at a time, the others fixed at the
+    incumbent, until a pass over every item brings no improvement or the
+    budget ends."""
+    from cplex import SparsePair
+
+    objective = cpx.solution.get_objective_value()
+    columns = np.arange(values.size).tolist()
+    for _ in range(passes):
+        improved = False
+        for item in range(setups.shape[0]):
+            if time.time() >= deadline:
+                return values
+            others = np.delete(setups, item, axis=0).ravel()
+            rounded = np.round(values[others])
+            _set_bounds(cpx, others, rounded, rounded)
+            _set_bounds(cpx, setups[item], 0, 1)
+            cpx.MIP_starts.delete()
+            cpx.MIP_starts.add(
+                SparsePair(ind=columns, val=values.tolist()),
+                cpx.MIP_starts.effort_level.repair,
+            )
+            candidate = _solve(cpx, deadline)
+            if candidate is None:
+                continue
+            candidate_objective = cpx.solution.get_objective_value()
+            if candidate_objective < objective - 1e-6 * max(1, abs(objective)):
+                values, objective = candidate, candidate_objective
+                improved = True
+        if not improved:
+            break
+    return values
+
+
+def primal_heuristic(f1, threads: int = 1) -> Optional[HeuristicSolution]:
+    start = time.time()
+    deadline = start + constants.HEURISTIC_BUDGET
+    cpx = subproblem_engine(f1.model, threads)
+    setups = setup_columns(f1)
+    values = relax_and_fix(
+        cpx,
+        setups,
+        constants.RELAX_AND_FIX_WINDOW,
+        constants.RELAX_AND_FIX_STEP,
+        deadline,
+    )
+    if values is None:
+        cpx.end()
+        return None
+    values = fix_and_optimize(
+        cpx, setups, values, constants.FIX_AND_OPTIMIZE_PASSES, deadline
+    )
+    # objective of the kept incumbent, not of the last subproblem
+    objective_value = float(np.dot(cpx.objective.get_linear(), values)) + (
+        cpx.objective.get_offset()
+    )
+    cpx.end()
+    return HeuristicSolution(values, objective_value, time.time() - start)
+
+
+def heuristic_mip_start(f1, heuristic: HeuristicSolution):
+    # only the setups: SolveFixed fills in the continuous part with one LP
+    mdl = f1.model
+    mip_start = mdl.new_solution()
+    for variables in (f1.setup_end_products, f1.setup_ingredients):
+        for var in variables.values():
+            mip_start.add_var_value(var, round(heuristic.values[var.index]))
+    mdl.add_mip_start(mip_start, effort_level=EffortLevel.SolveFixed)
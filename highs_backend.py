@@ -0,0 +1,225 @@
+from typing import Optional, Tuple
+
+import highspy
+import numpy as np
+from docplex.util.status import JobSolveStatus
+from numpy import ndarray
+
+import constants
+from data import DataMultipleProducts
+from formulacao import Formulacao1, Formulacao2
+from kpis import backlog_cost, kpis_from_arrays
+from matrix_builder import ColumnIndex
+from solution import SolutionArrays, solution_from_values
+
+INF = highspy.kHighsInf
+# statuses reported as in the CPLEX runs, the others mean no solution
+STATUS = {
+    highspy.HighsModelStatus.kOptimal: JobSolveStatus.OPTIMAL_SOLUTION,
+    highspy.HighsModelStatus.kTimeLimit: JobSolveStatus.FEASIBLE_SOLUTION,
+    highspy.HighsModelStatus.kSolutionLimit: JobSolveStatus.FEASIBLE_SOLUTION,
+    highspy.HighsModelStatus.kInterrupt: JobSolveStatus.FEASIBLE_SOLUTION,
+}
+
+
+def objective_costs(data: DataMultipleProducts, index: ColumnIndex) -> ndarray:
+    # per column, the objective Formulacao1 minimizes
+    costs = np.zeros(index.number_of_columns)
+    costs[index["yE"]] = data.setup_cost_end[0]
+    costs[index["xE"]] = data.production_cost_end[0]
+    costs[index["sE"]] = data.holding_cost_end[0]
+    costs[index["bE"]] = backlog_cost(data)
+    costs[index["y"]] = data.setup_cost_ingredient[:, np.newaxis]
+    costs[index["x"]] = data.production_cost_ingredient[:, np.newaxis]
+    costs[index["s"]] = data.holding_cost_ingredient[:, np.newaxis]
+    return costs
+
+
+def _int32(values) -> ndarray:
+    return np.asarray(values, dtype=np.int32)
+
+
+class HighsBackend:
+    """The vectorized constraint families of a formulation emitted to HiGHS
+    instead of CPLEX.
+
+    Rows come from the same matrix_builder blocks, so both backends solve the
+    same matrix. There are no docplex variables: the setup attributes map
+    (item, t) to a column, and the KPIs come from the solution arrays.
+    """
+
+    backend = "highs"
+
+    def __init__(
+        self,
+        data: DataMultipleProducts,
+        vectorized: bool = True,
+        presolve: bool = False,
+        tight_big_m: bool = False,
+        solver_kpis: bool = False,
+        model_cache_path: Optional[str] = None,
+    ):
+        super().__init__(
+            data,
+            vectorized=True,
+            presolve=presolve,
+            tight_big_m=tight_big_m,
+            solver_kpis=False,
+        )
+
+    def new_model(self):
+        model = highspy.Highs()
+        model.setOptionValue("output_flag", False)
+        return model
+
+    def build_variables(self):
+        self._column_index = ColumnIndex(
+            self.data, proportions=not self.substitute_proportions
+        )
+        self._add_columns(self._column_index.number_of_columns)
+        self._set_binary(self._column_index["yE"])
+        self._set_binary(self._column_index["y"])
+        self.setup_end_products = dict(np.ndenumerate(self._column_index["yE"]))
+        self.setup_ingredients = dict(np.ndenumerate(self._column_index["y"]))
+
+    def _add_columns(self, number: int, ub: float = INF):
+        self.model.addCols(
+            number,
+            np.zeros(number),
+            np.zeros(number),
+            np.full(number, ub),
+            0,
+            _int32([]),
+            _int32([]),
+            np.array([]),
+        )
+
+    def _set_binary(self, cols: ndarray):
+        cols = _int32(cols.ravel())
+        self.model.changeColsIntegrality(
+            cols.size, cols, np.full(cols.size, highspy.HighsVarType.kInteger)
+        )
+        self.model.changeColsBounds(
+            cols.size, cols, np.zeros(cols.size), np.ones(cols.size)
+        )
+
+    def _add_matrix_constraints(self, blocks):
+        first = self.model.getNumRow()
+        for block in blocks:
+            n = block.number_of_rows
+            rhs = block.rhs.astype(float)
+            lower = rhs if block.sense in ("ge", "eq") else np.full(n, -INF)
+            upper = rhs if block.sense in ("le", "eq") else np.full(n, INF)
+            starts = np.searchsorted(block.rows, np.arange(n))
+            self.model.addRows(
+                n,
+                np.clip(lower, -INF, INF),
+                np.clip(upper, -INF, INF),
+                block.cols.size,
+                _int32(starts),
+                _int32(block.cols),
+                block.vals.astype(float),
+            )
+        return list(range(first, self.model.getNumRow()))
+
+    def set_objective(self):
+        costs = objective_costs(self.data, self._column_index)
+        cols = _int32(np.arange(costs.size))
+        self.model.changeColsCost(costs.size, cols, costs)
+
+    def set_parameters(self, timelimit: float, threads: int, mipgap: float = None):
+        self.model.setOptionValue("time_limit", float(timelimit))
+        self.model.setOptionValue("threads", int(threads))
+        if mipgap is not None:
+            self.model.setOptionValue("mip_rel_gap", float(mipgap))
+
+    def _set_rhs(self, rows, value):
+        # only the capacity rows change, all of them <=
+        rows = _int32(rows)
+        value = float(np.clip(value, -INF, INF))
+        self.model.changeRowsBounds(
+            rows.size, rows, np.full(rows.size, -INF), np.full(rows.size, value)
+        )
+
+    def _set_big_m(self, rows, setups, big_m):
+        for row, col, m in zip(rows, setups.values(), big_m.ravel()):
+            self.model.changeCoeff(row, int(col), -float(m))
+
+    def incumbent(self) -> Optional[ndarray]:
+        status = self.model.getInfo().primal_solution_status
+        if status != highspy.SolutionStatus.kSolutionStatusFeasible:
+            return None
+        return np.asarray(self.model.getSolution().col_value)
+
+    def solve(self, mip_start: ndarray = None) -> Tuple[Optional[SolutionArrays], dict]:
+        """Solution and KPIs as solve_formulation reports them, the solution
+        None when HiGHS found none."""
+        if mip_start is not None:
+            start = highspy.HighsSolution()
+            start.col_value = mip_start.tolist()
+            self.model.setSolution(start)
+        self.model.run()
+        info = self.model.getInfo()
+        status = STATUS.get(self.model.getModelStatus())
+        kpis = {
+            "Best Bound": info.mip_dual_bound,
+            "Gap": info.mip_gap,
+            "Nodes Processed": info.mip_node_count,
+            "Tempo de Solução": self.model.getRunTime(),
+        }
+        values = self.incumbent()
+        if status is None or values is None:
+            return None, kpis
+        solution = solution_from_values(values, self.data, self._column_index)
+        kpis.update(kpis_from_arrays(self.data, solution))
+        kpis["objective_function"] = info.objective_function_value
+        kpis["status"] = status.name
+        kpis["Time to Optimal"] = (
+            kpis["Tempo de Solução"]
+            if status == JobSolveStatus.OPTIMAL_SOLUTION
+            else None
+        )
+        return solution, kpis
+
+    def solve_lp_relaxation(self, threads: int = 1) -> Optional[float]:
+        lp = self.model.getLp()
+        lp.integrality_ = []
+        relaxation = self.new_model()
+        relaxation.passModel(lp)
+        relaxation.setOptionValue("time_limit", float(constants.TIMELIMIT))
+        relaxation.setOptionValue("threads", int(threads))
+        relaxation.run()
+        if relaxation.getModelStatus() != highspy.HighsModelStatus.kOptimal:
+            return None
+        return relaxation.getInfo().objective_function_value
+
+
+class HighsFormulacao1(HighsBackend, Formulacao1):
+    pass
+
+
+class HighsFormulacao2(HighsBackend, Formulacao2):
+    def build_variables(self):
+        HighsBackend.build_variables(self)
+        K = self.data.END_PRODUCTS.shape[0]
+        I = self.data.INGREDIENTS.shape[0]
+        T = self.data.PERIODS.shape[0]
+        self._column_index.add("w", (K, T, T))
+        self._column_index.add("u", (K, T))
+        self._column_index.add("v", (I, T, T))
+        self._add_columns(K * T * T + K * T + I * T * T)
+        # ingredients are never backlogged
+        s, t = np.triu_indices(T, k=1)
+        backlogged = _int32(self._column_index["v"][:, t, s].ravel())
+        self.model.changeColsBounds(
+            backlogged.size,
+            backlogged,
+            np.zeros(backlogged.size),
+            np.zeros(backlogged.size),
+        )
+
+
+HIGHS_FORMULACOES = {
+    HighsFormulacao1.name: HighsFormulacao1,
+    HighsFormulacao2.name: HighsFormulacao2,
+}
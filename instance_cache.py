@@ -0,0 +1,86 @@
+import hashlib
+import os
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+from numpy import ndarray
+
+import constants
+from dat_parser import read_dat
+
+# instance tables mapped from shared memory by the pool initializer
+_shared_tables: Dict[str, ndarray] = {}
+
+
+def register_shared_tables(tables: Dict[str, ndarray]) -> None:
+    _shared_tables.update(tables)
+
+
+def instance_path(file_to_read: str) -> Path:
+    return Path.cwd() / "data" / Path(file_to_read)
+
+
+def cache_file(file_to_read: str, cache_path: str) -> Path:
+    return Path(cache_path) / f"{Path(file_to_read).name}.npy"
+
+
+def file_hash(path: Path) -> str:
+    return hashlib.sha1(path.read_bytes()).hexdigest()
+
+
+def compile_instance(file_to_read: str) -> ndarray:
+    return read_dat(instance_path(file_to_read))
+
+
+def _read_cache(compiled: Path, path: Path):
+    try:
+        record = np.load(compiled)
+        table = record["table"]
+    except (OSError, ValueError):
+        return None
+    stat = path.stat()
+    if int(record["mtime_ns"]) == stat.st_mtime_ns:
+        return table
+    # touched but possibly unchanged: fall back to the content hash
+    sha1 = record["sha1"].item().decode()
+    if sha1 == file_hash(path):
+        _write_cache(compiled, table, stat.st_mtime_ns, sha1)
+        return table
+    return None
+
+
+def _write_cache(compiled: Path, table: ndarray, mtime_ns: int, sha1: str) -> None:
+    # single fixed-layout record: one np.load per instance, no zip archive
+    record = np.empty(
+        (),
+        dtype=[("mtime_ns", "<i8"), ("sha1", "S40"), ("table", "<f8", table.shape)],
+    )
+    record["mtime_ns"] = mtime_ns
+    record["sha1"] = sha1.encode()
+    record["table"] = table
+    compiled.parent.mkdir(parents=True, exist_ok=True)
+    # several workers may compile the same file, rename is atomic
+    temporary = compiled.with_name(f"{compiled.name}.{os.getpid()}.tmp")
+    with open(temporary, "wb") as f:
+        np.save(f, record)
+    os.replace(temporary, compiled)
+
+
+def load_instance(
+    file_to_read: str, cache_path: str = constants.INSTANCE_CACHE_PATH
+) -> ndarray:
+    if file_to_read in _shared_tables:
+        return _shared_tables[file_to_read]
+    if not constants.INSTANCE_CACHE:
+        return compile_instance(file_to_read)
+    path = instance_path(file_to_read)
+    compiled = cache_file(file_to_read, cache_path)
+    if compiled.exists():
+        table = _read_cache(compiled, path)
+        if table is not None:
+            return table
+    mtime_ns = path.stat().st_mtime_ns
+    table = compile_instance(file_to_read)
+    _write_cache(compiled, table, mtime_ns, file_hash(path))
+    return table
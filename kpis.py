@@ -0,0 +1,66 @@
+import numpy as np
+from numpy import ndarray
+
+from data import DataMultipleProducts
+from solution import SolutionArrays
+
+# backlog cost per unit and period, times max(holding, setup) of the end products
+BACKLOG_PENALTY = 100
+
+
+def backlog_cost(data: DataMultipleProducts) -> float:
+    return BACKLOG_PENALTY * max(data.holding_cost_end[0], data.setup_cost_end[0])
+
+
+def end_product_capacity_usage(
+    data: DataMultipleProducts, solution: SolutionArrays
+) -> ndarray:
+    # [t]: setup and production time of every end product
+    return (
+        data.setup_time_end[0] * solution["yE"]
+        + data.production_time_end[0] * solution["xE"]
+    ).sum(axis=0)
+
+
+def kpis_from_arrays(data: DataMultipleProducts, solution: SolutionArrays) -> dict:
+    """The KPIs Formulacao1 publishes, evaluated on the variable arrays of a
+    solution instead of as expressions in the solver."""
+    kpis = {
+        "setup_cost_end_products": data.setup_cost_end[0] * solution["yE"].sum(),
+        "production_cost_end_products": data.production_cost_end[0]
+        * solution["xE"].sum(),
+        "holding_cost_end_products": data.holding_cost_end[0] * solution["sE"].sum(),
+    }
+    kpis["end_products_cost"] = (
+        kpis["setup_cost_end_products"]
+        + kpis["production_cost_end_products"]
+        + kpis["holding_cost_end_products"]
+    )
+    kpis["setup_cost_ingredients"] = np.dot(
+        data.setup_cost_ingredient, solution["y"].sum(axis=1)
+    )
+    kpis["production_cost_ingredients"] = np.dot(
+        data.production_cost_ingredient, solution["x"].sum(axis=1)
+    )
+    kpis["holding_cost_end_ingredients"] = np.dot(
+        data.holding_cost_ingredient, solution["s"].sum(axis=1)
+    )
+    # same column order as the solver KPIs
+    backlogged = backlog_cost(data) * solution["bE"].sum()
+    kpis["ingredients_cost"] = (
+        kpis["setup_cost_ingredients"]
+        + kpis["production_cost_ingredients"]
+        + kpis["holding_cost_end_ingredients"]
+        + backlogged
+    )
+    kpis["backlogged_end_products_cost"] = backlogged
+    kpis["total_backlogged_end_products"] = solution["bE"].sum()
+    T = data.PERIODS.shape[0]
+    kpis["end_product_uc"] = end_product_capacity_usage(data, solution).sum() / (
+        data.capacity * T
+    )
+    kpis["ingredients_uc"] = solution["x"].sum() / (
+        data.ingredient_capacity[0] * T * data.INGREDIENTS.shape[0]
+    )
+    kpis["objective_function"] = kpis["end_products_cost"] + kpis["ingredients_cost"]
+    return kpis
@@ -1,7 +1,18 @@
-from formulacao import Formulacao1
+import sys
+
+import constants
+from formulacao import Formulacao1, Formulacao2
 from utils import running_all_instance_with_chosen_capacity
 
+FORMULACOES = {Formulacao1.name: Formulacao1, Formulacao2.name: Formulacao2}
+
 if __name__ == "__main__":
+    # python main.py formulacao2
+    name = sys.argv[1] if len(sys.argv) > 1 else constants.FORMULACAO
+    if constants.SOLVER_BACKEND == "highs":
+        # highspy só é necessário com este backend
+        from highs_backend import HIGHS_FORMULACOES as FORMULACOES
+
     running_all_instance_with_chosen_capacity(
-        Formulacao1, path_to_save="formulacao1.xlsx"
+        FORMULACOES[name], path_to_save=f"{name}.xlsx"
     )
@@ -0,0 +1,421 @@
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+import numpy as np
+from numpy import ndarray
+
+from data import DataMultipleProducts, suffix_sums
+
+VARIABLE_NAMES = ("xE", "yE", "sE", "bE", "p", "x", "y", "s")
+
+
+@dataclass
+class MatrixBlock:
+    rows: ndarray
+    cols: ndarray
+    vals: ndarray
+    rhs: ndarray
+    sense: str
+
+    @property
+    def number_of_rows(self) -> int:
+        return self.rhs.shape[0]
+
+
+def fixed_blend(data) -> bool:
+    # every proportion pinned to ub * xE by its own bounds
+    return np.array_equal(data.lb[:, 0], data.ub[:, 0])
+
+
+class ColumnIndex(object):
+    """Column position of every variable, in the order Formulacao1 creates them.
+
+    Without proportions the p columns do not exist: fixed blends are
+    substituted by ub * xE."""
+
+    def __init__(self, data: DataMultipleProducts, proportions: bool = True) -> None:
+        K = data.END_PRODUCTS.shape[0]
+        I = data.INGREDIENTS.shape[0]
+        T = data.PERIODS.shape[0]
+        self.shapes: Dict[str, Tuple[int, ...]] = {
+            "xE": (K, T),
+            "yE": (K, T),
+            "sE": (K, T),
+            "bE": (K, T),
+            "p": (I, K, T),
+            "x": (I, T),
+            "y": (I, T),
+            "s": (I, T),
+        }
+        self.columns: Dict[str, ndarray] = {}
+        offset = 0
+        for name in VARIABLE_NAMES:
+            if name == "p" and not proportions:
+                continue
+            size = int(np.prod(self.shapes[name]))
+            self.columns[name] = np.arange(offset, offset + size).reshape(
+                self.shapes[name]
+            )
+            offset += size
+        self.number_of_columns = offset
+
+    def add(self, name: str, shape: Tuple[int, ...]) -> None:
+        # columns created after the ones above, e.g. by Formulacao2
+        size = int(np.prod(shape))
+        self.shapes[name] = shape
+        self.columns[name] = np.arange(
+            self.number_of_columns, self.number_of_columns + size
+        ).reshape(shape)
+        self.number_of_columns += size
+
+    def __getitem__(self, name: str) -> ndarray:
+        return self.columns[name]
+
+
+def _block(terms, rhs, sense: str) -> MatrixBlock:
+    # terms: list of (cols, coefs), cols with one line per row of the family
+    rhs = np.asarray(rhs, dtype=float).ravel()
+    n_rows = rhs.shape[0]
+    cols, vals = [], []
+    for c, v in terms:
+        c = np.asarray(c).reshape(n_rows, -1)
+        cols.append(c)
+        vals.append(np.broadcast_to(np.asarray(v, dtype=float), c.shape))
+    cols = np.concatenate(cols, axis=1)
+    vals = np.concatenate(vals, axis=1)
+    rows = np.repeat(np.arange(n_rows), cols.shape[1])
+    cols = cols.ravel()
+    vals = vals.ravel()
+    nonzero = vals != 0
+    return MatrixBlock(rows[nonzero], cols[nonzero], vals[nonzero], rhs, sense)
+
+
+def _flat(columns: ndarray) -> ndarray:
+    return columns.reshape(-1, 1)
+
+
+def balance_inventory_end_products(data, idx: ColumnIndex):
+    xE, sE, bE = idx["xE"], idx["sE"], idx["bE"]
+    first = _block(
+        [
+            (_flat(xE[:, 0]), 1.0),
+            (_flat(bE[:, 0]), 1.0),
+            (_flat(sE[:, 0]), -1.0),
+        ],
+        data.demand_end[:, 0],
+        "eq",
+    )
+    others = _block(
+        [
+            (_flat(sE[:, :-1]), 1.0),
+            (_flat(xE[:, 1:]), 1.0),
+            (_flat(bE[:, 1:]), 1.0),
+            (_flat(bE[:, :-1]), -1.0),
+            (_flat(sE[:, 1:]), -1.0),
+        ],
+        data.demand_end[:, 1:],
+        "eq",
+    )
+    return first, others
+
+
+def end_products_capacity_limit(data) -> float:
+    # most any end product can be made in one period once set up
+    if data.production_time_end[0] <= 0:
+        return np.inf
+    return max(data.capacity - data.setup_time_end[0], 0) / data.production_time_end[0]
+
+
+def setup_big_m_end_products(data, tight: bool = False) -> ndarray:
+    # [k, t]: remaining demand, or what capacity lets through if smaller
+    big_m = data.sum_demand_end[:, :, 0]
+    if tight:
+        big_m = np.minimum(big_m, end_products_capacity_limit(data))
+    return big_m
+
+
+def setup_big_m_ingredients(data, tight: bool = False) -> ndarray:
+    # [i, t]: ub of i summed over the products times the remaining demand of
+    # all of them; tight: what is consumed from t on at most (production
+    # beyond that is only left over), capped by the ingredient capacity
+    K = data.END_PRODUCTS.shape[0]
+    ub = data.ub[:, 0]
+    big_m = np.outer(ub * K, data.sum_demand_end[:, :, 0].sum(axis=0))
+    if tight:
+        end_products = np.minimum(
+            setup_big_m_end_products(data, tight=True).sum(axis=0),
+            end_products_capacity_limit(data),
+        )
+        consumed = np.outer(ub, suffix_sums(end_products))
+        big_m = np.minimum(np.minimum(big_m, consumed), data.ingredient_capacity[0])
+    return big_m
+
+
+def setup_end_products(data, idx: ColumnIndex, big_m: ndarray):
+    return (
+        _block(
+            [
+                (_flat(idx["xE"]), 1.0),
+                (_flat(idx["yE"]), -_flat(big_m)),
+            ],
+            np.zeros(idx["xE"].size),
+            "le",
+        ),
+    )
+
+
+def capacity_end_products(data, idx: ColumnIndex):
+    # one row per period, alternating yE/xE of each product as in the expression
+    yE = idx["yE"].T
+    xE = idx["xE"].T
+    K = yE.shape[1]
+    cols = np.empty((yE.shape[0], 2 * K), dtype=int)
+    cols[:, 0::2] = yE
+    cols[:, 1::2] = xE
+    coefs = np.empty(2 * K)
+    coefs[0::2] = data.setup_time_end[0]
+    coefs[1::2] = data.production_time_end[0]
+    return (
+        _block(
+            [(cols, coefs)],
+            np.full(yE.shape[0], data.capacity, dtype=float),
+            "le",
+        ),
+    )
+
+
+def capacity_ingredients(data, idx: ColumnIndex):
+    return (
+        _block(
+            [(_flat(idx["x"]), 1.0)],
+            np.full(idx["x"].size, data.ingredient_capacity[0], dtype=float),
+            "le",
+        ),
+    )
+
+
+def _consumption(data, idx: ColumnIndex, periods: slice, coef: float):
+    # rows (i, t): sum over k of p[i, k, t], or of ub[i] * xE[k, t] when the
+    # proportions are substituted
+    if "p" in idx.columns:
+        p = idx["p"][:, :, periods]
+        return p.transpose(0, 2, 1).reshape(-1, p.shape[1]), coef
+    xE = idx["xE"][:, periods].T
+    I = data.INGREDIENTS.shape[0]
+    cols = np.broadcast_to(xE[np.newaxis], (I,) + xE.shape)
+    coefs = np.broadcast_to(coef * data.ub[:, 0, np.newaxis, np.newaxis], cols.shape)
+    return cols.reshape(-1, xE.shape[1]), coefs.reshape(-1, xE.shape[1])
+
+
+def balance_inventory_ingredients(data, idx: ColumnIndex):
+    x, s = idx["x"], idx["s"]
+    first = _block(
+        [
+            (_flat(x[:, 0]), 1.0),
+            _consumption(data, idx, slice(0, 1), -1.0),
+            (_flat(s[:, 0]), -1.0),
+        ],
+        np.zeros(x.shape[0]),
+        "eq",
+    )
+    others = _block(
+        [
+            (_flat(s[:, :-1]), 1.0),
+            (_flat(x[:, 1:]), 1.0),
+            _consumption(data, idx, slice(1, None), -1.0),
+            (_flat(s[:, 1:]), -1.0),
+        ],
+        np.zeros(x[:, 1:].size),
+        "eq",
+    )
+    return first, others
+
+
+def setup_ingredients(data, idx: ColumnIndex, big_m: ndarray):
+    return (
+        _block(
+            [
+                (_flat(idx["x"]), 1.0),
+                (_flat(idx["y"]), -_flat(big_m)),
+            ],
+            np.zeros(idx["x"].size),
+            "le",
+        ),
+    )
+
+
+def _proportion_bounds(data, idx: ColumnIndex, bounds: ndarray, sense: str):
+    # rows ordered (k, i, t) as in the original generator
+    if "p" not in idx.columns:
+        # substituted proportions meet both bounds by construction
+        return ()
+    p = idx["p"].transpose(1, 0, 2)
+    K, I, T = p.shape
+    xE = np.broadcast_to(idx["xE"][:, np.newaxis, :], (K, I, T))
+    coefs = np.broadcast_to(bounds[np.newaxis, :, 0, np.newaxis], (K, I, T))
+    return (
+        _block(
+            [
+                (_flat(p), 1.0),
+                (_flat(xE), -_flat(coefs)),
+            ],
+            np.zeros(p.size),
+            sense,
+        ),
+    )
+
+
+def upper_ingredients(data, idx: ColumnIndex):
+    return _proportion_bounds(data, idx, data.ub, "le")
+
+
+def lower_ingredients(data, idx: ColumnIndex):
+    return _proportion_bounds(data, idx, data.lb, "ge")
+
+
+def total_proportion_end_products(data, idx: ColumnIndex):
+    if "p" not in idx.columns:
+        # sum of ub * xE == xE: nothing left unless the ub do not add up to 1
+        excess = data.ub[:, 0].sum() - 1
+        if np.isclose(excess, 0):
+            return ()
+        return (
+            _block(
+                [(_flat(idx["xE"]), excess)],
+                np.zeros(idx["xE"].size),
+                "eq",
+            ),
+        )
+    p = idx["p"]
+    I = p.shape[0]
+    return (
+        _block(
+            [
+                (p.transpose(1, 2, 0).reshape(-1, I), 1.0),
+                (_flat(idx["xE"]), -1.0),
+            ],
+            np.zeros(idx["xE"].size),
+            "eq",
+        ),
+    )
+
+
+def _transfer_masks(T: int):
+    # [r, s, t]: production of s serving t is in stock (s <= r < t) or
+    # backlogged (t <= r < s) at the end of period r
+    r, s, t = np.ogrid[:T, :T, :T]
+    return ((s <= r) & (r < t)).astype(float), ((t <= r) & (r < s)).astype(float)
+
+
+def facility_location_end_products(data, idx: ColumnIndex):
+    # w[k, s, t]: produced in s for the demand of t, u[k, t]: never served
+    w, u = idx["w"], idx["u"]
+    K, T = u.shape
+    stock, backlog = _transfer_masks(T)
+    demand = _block(
+        [(w.transpose(0, 2, 1).reshape(-1, T), 1.0), (_flat(u), 1.0)],
+        data.demand_end,
+        "eq",
+    )
+    production = _block(
+        [(_flat(idx["xE"]), 1.0), (w.reshape(-1, T), -1.0)],
+        np.zeros(K * T),
+        "eq",
+    )
+    rows_w = np.repeat(w.reshape(K, 1, T * T), T, axis=1).reshape(K * T, -1)
+    rows_u = np.repeat(u[:, np.newaxis, :], T, axis=1).reshape(K * T, -1)
+    inventory = _block(
+        [
+            (_flat(idx["sE"]), 1.0),
+            (rows_w, -np.tile(stock.reshape(T, -1), (K, 1))),
+        ],
+        np.zeros(K * T),
+        "eq",
+    )
+    served_by_r = (np.arange(T)[np.newaxis, :] <= np.arange(T)[:, np.newaxis]).astype(
+        float
+    )
+    backlogged = _block(
+        [
+            (_flat(idx["bE"]), 1.0),
+            (rows_w, -np.tile(backlog.reshape(T, -1), (K, 1))),
+            (rows_u, -np.tile(served_by_r, (K, 1))),
+        ],
+        np.zeros(K * T),
+        "eq",
+    )
+    return demand, production, inventory, backlogged
+
+
+def facility_location_setup_end_products(data, idx: ColumnIndex):
+    w, yE = idx["w"], idx["yE"]
+    K, T = yE.shape
+    yE = np.broadcast_to(yE[:, :, np.newaxis], (K, T, T))
+    demand = np.broadcast_to(data.demand_end[:, np.newaxis, :], (K, T, T))
+    return (
+        _block(
+            [(_flat(w), 1.0), (_flat(yE), -_flat(demand))],
+            np.zeros(w.size),
+            "le",
+        ),
+    )
+
+
+def facility_location_ingredients(data, idx: ColumnIndex):
+    # v[i, s, t]: produced in s for the consumption of t >= s
+    v = idx["v"]
+    I, T, _ = v.shape
+    stock, _ = _transfer_masks(T)
+    earlier = (np.arange(T)[:, np.newaxis] <= np.arange(T)[np.newaxis, :]).astype(float)
+    consumption = _block(
+        [
+            (v.transpose(0, 2, 1).reshape(-1, T), np.tile(earlier.T, (I, 1))),
+            _consumption(data, idx, slice(None), -1.0),
+        ],
+        np.zeros(I * T),
+        "eq",
+    )
+    production = _block(
+        [
+            (_flat(idx["x"]), 1.0),
+            (v.reshape(-1, T), -np.tile(earlier, (I, 1))),
+        ],
+        np.zeros(I * T),
+        "eq",
+    )
+    rows_v = np.repeat(v.reshape(I, 1, T * T), T, axis=1).reshape(I * T, -1)
+    inventory = _block(
+        [
+            (_flat(idx["s"]), 1.0),
+            (rows_v, -np.tile(stock.reshape(T, -1), (I, 1))),
+        ],
+        np.zeros(I * T),
+        "eq",
+    )
+    return consumption, production, inventory
+
+
+def facility_location_big_m_ingredients(data, tight: bool = False) -> ndarray:
+    # [i, t]: consumption of i in period t, ub of i times the end products
+    # made in t: their remaining demand; tight: capped by the capacity too
+    end_products = setup_big_m_end_products(data, tight).sum(axis=0)
+    if tight:
+        end_products = np.minimum(end_products, end_products_capacity_limit(data))
+    return np.outer(data.ub[:, 0], end_products)
+
+
+def facility_location_setup_ingredients(data, idx: ColumnIndex, big_m: ndarray):
+    # rows (i, s, t) for s <= t, each bounded by the consumption of t
+    v, y = idx["v"], idx["y"]
+    I, T = y.shape
+    s, t = np.triu_indices(T)
+    return (
+        _block(
+            [
+                (_flat(v[:, s, t]), 1.0),
+                (_flat(y[:, s]), -_flat(big_m[:, t])),
+            ],
+            np.zeros(I * s.size),
+            "le",
+        ),
+    )
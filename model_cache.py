@@ -0,0 +1,113 @@
+import hashlib
+import os
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+
+import constants
+
+# rows Formulacao1 keeps for update_capacities, engine indices; subclasses
+# extend them through cached_rows
+CACHED_ROWS = (
+    "_capacity_end_products_cts",
+    "_capacity_ingredients_cts",
+    "_setup_end_products_cts",
+    "_setup_ingredients_cts",
+)
+# bump when the matrix layout changes: old entries are never hit again
+LAYOUT_VERSION = 2
+
+
+def model_key(f1) -> str:
+    # capacities left out: a hit gets them through _set_capacity_rows
+    digest = hashlib.sha1(f1.data.canonical_key(capacities=False).encode())
+    digest.update(
+        repr(
+            (f1.name, f1.substitute_proportions, f1.tight_big_m, LAYOUT_VERSION)
+        ).encode()
+    )
+    return digest.hexdigest()
+
+
+def cache_files(key: str, cache_path: str) -> Tuple[Path, Path]:
+    return Path(cache_path) / f"{key}.sav", Path(cache_path) / f"{key}.npz"
+
+
+def file_hash(path: Path) -> str:
+    return hashlib.sha1(path.read_bytes()).hexdigest()
+
+
+def load_model(f1, cache_path: str = constants.MODEL_CACHE_PATH) -> bool:
+    """Reads the cached rows, bounds and objective into the engine of f1,
+    whose variables are already built. False on a miss."""
+    from cplex.exceptions import CplexError
+
+    model_file, rows_file = cache_files(model_key(f1), cache_path)
+    try:
+        with np.load(rows_file) as record:
+            rows = {name: record[name].tolist() for name in f1.cached_rows}
+            sha1 = record["sha1"].item()
+        # a half-written or truncated file must never reach the engine
+        if sha1 != file_hash(model_file):
+            return False
+        f1.model.get_cplex().read(str(model_file))
+    except (OSError, KeyError, ValueError, CplexError):
+        return False
+    # LRU: the modification time is the last use
+    for path in (model_file, rows_file):
+        os.utime(path)
+    for name, value in rows.items():
+        setattr(f1, name, value)
+    return True
+
+
+def _replace(path: Path, write) -> None:
+    # several workers may build the same model, rename is atomic
+    temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    write(temporary)
+    os.replace(temporary, path)
+
+
+def store_model(
+    f1,
+    cache_path: str = constants.MODEL_CACHE_PATH,
+    size_limit: int = constants.MODEL_CACHE_SIZE,
+) -> None:
+    model_file, rows_file = cache_files(model_key(f1), cache_path)
+    model_file.parent.mkdir(parents=True, exist_ok=True)
+    _replace(
+        model_file, lambda path: f1.model.get_cplex().write(str(path), filetype="sav")
+    )
+    rows = {name: np.asarray(getattr(f1, name), dtype=int) for name in f1.cached_rows}
+
+    def write_rows(path):
+        with open(path, "wb") as f:
+            np.savez(f, sha1=file_hash(model_file), **rows)
+
+    _replace(rows_file, write_rows)
+    evict(cache_path, size_limit)
+
+
+def evict(cache_path: str, size_limit: int) -> None:
+    """Drops the least recently used models until the cache fits."""
+    entries = []
+    for model_file in Path(cache_path).glob("*.sav"):
+        files = cache_files(model_file.stem, cache_path)
+        try:
+            stats = [path.stat() for path in files]
+        except FileNotFoundError:
+            continue
+        entries.append(
+            (stats[0].st_mtime_ns, sum(stat.st_size for stat in stats), files)
+        )
+    total = sum(size for _, size, _ in entries)
+    for _, size, files in sorted(entries, key=lambda entry: entry[0]):
+        if total <= size_limit:
+            break
+        for path in files:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+        total -= size
@@ -0,0 +1,79 @@
+import resource
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+import pandas as pd
+
+PHASE_FIELDS = ("Wall Time", "CPU Time", "Peak RSS (MB)")
+
+
+def _reset_peak_rss() -> None:
+    # Linux only: restarts VmHWM so each phase reports its own peak
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _peak_rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # process-wide peak, in kB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class PhaseTimer(object):
+    """Wall time, CPU time (every thread of the process, CPLEX's included) and
+    peak RSS of each named phase; repeated phases accumulate."""
+
+    def __init__(self) -> None:
+        self.phases: Dict[str, List[float]] = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        _reset_peak_rss()
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            self.add(
+                name,
+                time.perf_counter() - wall,
+                time.process_time() - cpu,
+                _peak_rss_mb(),
+            )
+
+    def add(self, name: str, wall: float, cpu: float, peak_rss: float) -> None:
+        previous = self.phases.get(name, [0.0, 0.0, 0.0])
+        self.phases[name] = [
+            previous[0] + wall,
+            previous[1] + cpu,
+            max(previous[2], peak_rss),
+        ]
+
+    def merge(self, phases: Dict[str, List[float]]) -> None:
+        for name, values in phases.items():
+            self.add(name, *values)
+
+    def as_kpis(self) -> Dict[str, float]:
+        return {
+            f"{name} {field}": value
+            for name, values in self.phases.items()
+            for field, value in zip(PHASE_FIELDS, values)
+        }
+
+    def profile(self) -> pd.DataFrame:
+        df = pd.DataFrame.from_dict(
+            self.phases, orient="index", columns=list(PHASE_FIELDS)
+        )
+        df.index.name = "Phase"
+        df["Wall Share"] = df["Wall Time"] / df["Wall Time"].sum()
+        return df.sort_values("Wall Time", ascending=False)
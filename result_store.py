@@ -0,0 +1,158 @@
+import json
+import os
+import socket
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict
+
+import pandas as pd
+
+import constants
+
+
+def _json_default(value):
+    # numpy scalars coming from the data arrays
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"{type(value)} is not JSON serializable")
+
+
+class ResultSink(ABC):
+    path: Path
+
+    @abstractmethod
+    def append(self, scenario: str, kpis: dict) -> None:
+        pass
+
+    def flush(self) -> None:
+        pass
+
+    @abstractmethod
+    def latest_records(self) -> Dict[str, dict]:
+        pass
+
+    def compact(self) -> pd.DataFrame:
+        return pd.DataFrame(list(self.latest_records().values()))
+
+
+class ExcelResultSink(ResultSink):
+    """One .xlsx per scenario, as the sweeps used to write."""
+
+    def __init__(self, path: str = constants.OTIMIZADOS_INDIVIDUAIS_PATH) -> None:
+        self.path = Path(path)
+
+    def append(self, scenario: str, kpis: dict) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        pd.DataFrame([kpis]).to_excel(
+            Path.resolve(self.path / f"{scenario}.xlsx"),
+            index=False,
+            engine="openpyxl",
+        )
+
+    def latest_records(self) -> Dict[str, dict]:
+        records = {}
+        for file in self.path.glob("*.xlsx"):
+            try:
+                records[file.stem] = pd.read_excel(file, engine="openpyxl").iloc[0]
+            except:
+                print(f"{file} corrompido")
+        return {scenario: kpis.to_dict() for scenario, kpis in records.items()}
+
+
+class SqliteResultSink(ResultSink):
+    """Append-only shard per worker process, written in batched transactions.
+
+    One file per process keeps writers from contending for a lock on the
+    cluster's shared filesystem, where SQLite WAL mode is not available.
+    """
+
+    def __init__(
+        self,
+        path: str = constants.RESULTS_PATH,
+        batch_size: int = constants.RESULT_BATCH_SIZE,
+    ) -> None:
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.shard = self.path / f"{socket.gethostname()}-{os.getpid()}.sqlite"
+        self._rows = []
+        self._connection = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.path.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(self.shard)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS results "
+                "(scenario TEXT, written_at REAL, kpis TEXT)"
+            )
+        return self._connection
+
+    def append(self, scenario: str, kpis: dict) -> None:
+        self._rows.append(
+            (scenario, time.time(), json.dumps(kpis, default=_json_default))
+        )
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._rows:
+            return
+        connection = self._connect()
+        with connection:
+            connection.executemany("INSERT INTO results VALUES (?, ?, ?)", self._rows)
+        self._rows = []
+
+    def iter_rows(self):
+        for shard in sorted(self.path.glob("*.sqlite")):
+            connection = sqlite3.connect(shard)
+            try:
+                yield from connection.execute(
+                    "SELECT scenario, written_at, kpis FROM results"
+                )
+            except sqlite3.DatabaseError:
+                print(f"{shard} corrompido")
+            finally:
+                connection.close()
+
+    def latest_records(self) -> Dict[str, dict]:
+        # a scenario written more than once (reruns) keeps its latest record
+        latest = {}
+        for scenario, written_at, kpis in self.iter_rows():
+            if scenario not in latest or written_at >= latest[scenario][0]:
+                latest[scenario] = (written_at, kpis)
+        return {scenario: json.loads(kpis) for scenario, (_, kpis) in latest.items()}
+
+
+RESULT_SINKS = {"xlsx": ExcelResultSink, "sqlite": SqliteResultSink}
+
+_sinks: Dict[str, ResultSink] = {}
+_sink_pid = None
+
+
+def get_result_sink(formulation: str = "formulacao1") -> ResultSink:
+    # one sink per formulation and process; forked workers must not share the
+    # master's shard
+    global _sink_pid
+    if _sink_pid != os.getpid():
+        _sinks.clear()
+        _sink_pid = os.getpid()
+    if formulation not in _sinks:
+        sink_class = RESULT_SINKS[constants.RESULT_SINK]
+        path = {
+            "xlsx": constants.OTIMIZADOS_INDIVIDUAIS_PATH,
+            "sqlite": constants.RESULTS_PATH,
+        }[constants.RESULT_SINK]
+        _sinks[formulation] = sink_class(Path(path) / formulation)
+    return _sinks[formulation]
+
+
+def export_results(df: pd.DataFrame, path_to_save: Path) -> None:
+    path_to_save = Path(path_to_save)
+    connection = sqlite3.connect(path_to_save.with_suffix(".sqlite"))
+    with connection:
+        df.to_sql("kpis", connection, if_exists="replace", index=False)
+    connection.close()
+    if constants.EXCEL_EXPORT:
+        df.to_excel(path_to_save.with_suffix(".xlsx"), index=False, engine="openpyxl")
@@ -0,0 +1,238 @@
+import fcntl
+import glob
+import heapq
+import os
+import re
+import tempfile
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+import constants
+
+INSTANCE_PATTERN = re.compile(r"(\d+)([A-Z]+)\d+")
+
+# from the most specific to the most general group of past scenarios
+FEATURE_LEVELS = (
+    (
+        "ingredients",
+        "instance_class",
+        "amount_of_end_products",
+        "type_cap_ingredients",
+        "capacity_multiplier",
+        "coef_cap",
+    ),
+    (
+        "ingredients",
+        "instance_class",
+        "amount_of_end_products",
+        "type_cap_ingredients",
+        "capacity_multiplier",
+    ),
+    ("ingredients", "instance_class", "amount_of_end_products"),
+    ("ingredients", "amount_of_end_products"),
+    ("amount_of_end_products",),
+)
+
+
+def instance_features(instance: str) -> Tuple[int, str]:
+    match = INSTANCE_PATTERN.match(instance)
+    if match is None:
+        return 0, ""
+    return int(match.group(1)), match.group(2)
+
+
+def read_history(pattern: str) -> pd.DataFrame:
+    list_files = []
+    for file in glob.glob(pattern):
+        try:
+            list_files.append(pd.read_excel(file, engine="openpyxl"))
+        except:
+            print(f"{file} corrompido")
+    if not list_files:
+        return pd.DataFrame()
+    return pd.concat(list_files, ignore_index=True)
+
+
+class SolveTimeModel(object):
+    """Predicts a scenario's solve time from the mean time of similar past
+    scenarios, falling back to coarser groups when there is no exact match."""
+
+    def __init__(self, history: pd.DataFrame, timelimit: float = constants.TIMELIMIT):
+        self.timelimit = timelimit
+        self._means: List[Dict[tuple, float]] = []
+        if history.empty or "Tempo de Solução" not in history:
+            self._global_mean = None
+            return
+        history = history.copy()
+        history["Tempo de Solução"] = pd.to_numeric(
+            history["Tempo de Solução"], errors="coerce"
+        ).clip(upper=timelimit)
+        history = history.dropna(subset=["Tempo de Solução"])
+        features = history["Instance"].astype(str).map(instance_features)
+        history["ingredients"] = features.str[0]
+        history["instance_class"] = features.str[1]
+        # older workbooks used labels ("N", "L") for the capacity multiplier
+        for column in ("capacity_multiplier", "coef_cap"):
+            if column not in history:
+                history[column] = np.nan
+            history[column] = pd.to_numeric(history[column], errors="coerce")
+        if "type_cap_ingredients" not in history:
+            history["type_cap_ingredients"] = (
+                constants.DEFAULT_TYPE_INGREDIENTS_CAPACITY
+            )
+        for level in FEATURE_LEVELS:
+            self._means.append(
+                history.groupby(list(level))["Tempo de Solução"].mean().to_dict()
+            )
+        self._global_mean = history["Tempo de Solução"].mean()
+
+    @classmethod
+    def from_history(cls, pattern: str = constants.HISTORY_PATTERN):
+        return cls(read_history(pattern))
+
+    def predict(
+        self,
+        dataset: str,
+        end_products: int,
+        capmult,
+        type_cap_ingredients: str,
+        coef_cap,
+        random_demand=True,
+    ) -> float:
+        ingredients, instance_class = instance_features(dataset.split(".")[0])
+        values = {
+            "ingredients": ingredients,
+            "instance_class": instance_class,
+            "amount_of_end_products": end_products,
+            "type_cap_ingredients": str.upper(type_cap_ingredients),
+            "capacity_multiplier": capmult,
+            "coef_cap": coef_cap,
+        }
+        for level, means in zip(FEATURE_LEVELS, self._means):
+            key = tuple(values[feature] for feature in level)
+            key = key[0] if len(key) == 1 else key
+            if key in means:
+                return means[key]
+        if self._global_mean is not None:
+            return self._global_mean
+        # no history at all: size of the model, tighter capacity is harder
+        return min(self.timelimit, ingredients * end_products / capmult)
+
+
+def task_cost(task: tuple, model: SolveTimeModel, sweep: bool) -> float:
+    if not sweep:
+        return model.predict(*task)
+    dataset, end_products, random_demand, capacity_scenarios = task
+    return sum(
+        model.predict(dataset, end_products, capmult, type_cap_ingredients, coef_cap)
+        for capmult, type_cap_ingredients, coef_cap in capacity_scenarios
+    )
+
+
+def longest_job_first(
+    tasks, model: SolveTimeModel, sweep: bool
+) -> Tuple[List[tuple], List[float]]:
+    costs = [task_cost(task, model, sweep) for task in tasks]
+    order = sorted(range(len(tasks)), key=lambda i: costs[i], reverse=True)
+    return [tasks[i] for i in order], [costs[i] for i in order]
+
+
+def simulate_makespan(costs, workers: int) -> float:
+    # greedy list scheduling: each task goes to the first worker to free up
+    finish = [0.0] * max(workers, 1)
+    for cost in costs:
+        heapq.heappush(finish, heapq.heappop(finish) + cost)
+    return max(finish)
+
+
+class NodeCores(object):
+    """Cores in use on this node, shared by its workers through a locked file."""
+
+    def __init__(self, run_id: str, cores_per_node: int = None) -> None:
+        self.cores_per_node = cores_per_node or os.cpu_count()
+        self.path = Path(tempfile.gettempdir()) / f"lotsizing-{run_id}.cores"
+
+    def _update(self, change) -> int:
+        with open(self.path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            used = int(f.read() or 0)
+            delta = change(used)
+            f.seek(0)
+            f.truncate()
+            f.write(str(used + delta))
+            fcntl.flock(f, fcntl.LOCK_UN)
+        return delta
+
+    def remove(self) -> None:
+        self.path.unlink(missing_ok=True)
+
+    @contextmanager
+    def reserve(self, requested: int):
+        # a busy worker always gets its own core, extra threads only if free
+        granted = self._update(
+            lambda used: max(1, min(requested, self.cores_per_node - used))
+        )
+        try:
+            yield granted
+        finally:
+            self._update(lambda used: -granted)
+
+
+def run_with_threads(task, threads: int, run_id: str, *args):
+    with NodeCores(run_id, constants.CORES_PER_NODE).reserve(threads) as granted:
+        return task(*args, threads=granted)
+
+
+def thread_budget(
+    pending: int, in_flight_threads: int, workers: int, total_cores: int
+) -> int:
+    """Threads for the next submission, 0 to hold it until more cores are idle.
+
+    While the queue fills every worker each task runs on one core. Once fewer
+    tasks than workers are left, the last ones share all the cores: a task
+    waits until its share is idle instead of taking the one core just freed.
+    """
+    if pending >= workers:
+        return 1
+    share = max(1, min(constants.MAX_THREADS, total_cores // pending))
+    if total_cores - in_flight_threads < share:
+        return 0
+    return share
+
+
+def run_packed(packed: tuple):
+    # Pool.imap_unordered passes a single argument
+    task, args = packed
+    return task(*args)
+
+
+def dispatch_adaptive(executor, task, arguments, workers: int, run_id: str):
+    # keeps at most one task per worker in flight so the thread budget of each
+    # submission reflects how far the queue has drained; in the tail a task is
+    # held until its share of the cores is idle. Results are yielded as they
+    # complete
+    pending = deque(arguments)
+    in_flight = {}
+    while pending or in_flight:
+        while pending and len(in_flight) < workers:
+            threads = thread_budget(
+                len(pending), sum(in_flight.values()), workers, total_cores=workers
+            )
+            if not threads:
+                break
+            future = executor.submit(
+                run_with_threads, task, threads, run_id, *pending.popleft()
+            )
+            in_flight[future] = threads
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            in_flight.pop(future)
+            yield future.result()
+    NodeCores(run_id).remove()
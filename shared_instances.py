@@ -0,0 +1,85 @@
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from typing import Dict, List, Tuple
+
+import numpy as np
+from numpy import ndarray
+
+import constants
+from dat_parser import TABLE_WIDTH
+from instance_cache import load_instance, register_shared_tables
+
+# keeps the worker's mapping alive while the tables are in use
+_segment = None
+
+
+def pack_instances(files: List[str]) -> Tuple[Dict[str, Tuple[int, int]], ndarray]:
+    # every table stacked in one block, index: file -> (first row, rows)
+    tables = [load_instance(file_to_read) for file_to_read in files]
+    if not tables:
+        return {}, np.empty((0, TABLE_WIDTH))
+    index = {}
+    offset = 0
+    for file_to_read, table in zip(files, tables):
+        index[file_to_read] = (offset, table.shape[0])
+        offset += table.shape[0]
+    return index, np.concatenate(tables)
+
+
+def table_views(buffer, index: Dict[str, Tuple[int, int]]) -> Dict[str, ndarray]:
+    rows = sum(n for _, n in index.values())
+    block = np.ndarray((rows, TABLE_WIDTH), dtype=float, buffer=buffer)
+    block.flags.writeable = False
+    return {
+        file_to_read: block[offset : offset + n]
+        for file_to_read, (offset, n) in index.items()
+    }
+
+
+def attach_shared_memory(name: str, index: Dict[str, Tuple[int, int]]) -> None:
+    global _segment
+    _segment = shared_memory.SharedMemory(name=name)
+    register_shared_tables(table_views(_segment.buf, index))
+
+
+def attach_node_window(files: List[str]) -> None:
+    # runs as the MPIPoolExecutor initializer: the first worker of each node
+    # reads the instances into a window shared by the workers of that node
+    global _segment
+    from mpi4py import MPI
+
+    try:
+        from mpi4py.futures import get_comm_workers
+    except ImportError:
+        print("mpi4py sem get_comm_workers, instâncias lidas por cada worker")
+        return
+    node = get_comm_workers().Split_type(MPI.COMM_TYPE_SHARED)
+    leader = node.Get_rank() == 0
+    index, block = pack_instances(files) if leader else (None, None)
+    index = node.bcast(index, root=0)
+    size = block.nbytes if leader else 0
+    _segment = MPI.Win.Allocate_shared(size, block.itemsize if leader else 1, comm=node)
+    buffer, _ = _segment.Shared_query(0)
+    if leader:
+        np.ndarray(block.shape, dtype=float, buffer=buffer)[:] = block
+    node.Barrier()
+    register_shared_tables(table_views(buffer, index))
+
+
+@contextmanager
+def shared_instances(files: List[str], mpi: bool):
+    """Yields the (initializer, initargs) that give pool workers read-only
+    views of every instance table instead of parsing the files themselves."""
+    if not constants.SHARED_INSTANCES:
+        yield None, ()
+    elif mpi:
+        yield attach_node_window, (files,)
+    else:
+        index, block = pack_instances(files)
+        segment = shared_memory.SharedMemory(create=True, size=max(block.nbytes, 1))
+        np.ndarray(block.shape, dtype=float, buffer=segment.buf)[:] = block
+        try:
+            yield attach_shared_memory, (segment.name, index)
+        finally:
+            segment.close()
+            segment.unlink()
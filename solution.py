@@ -0,0 +1,127 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+from numpy import ndarray
+
+from data import DataAbstractClass
+from matrix_builder import VARIABLE_NAMES, ColumnIndex
+
+# name of each variable family in the long format
+VALUE_NAMES = {
+    "xE": "end_products",
+    "yE": "setup_end_products",
+    "sE": "inventory_end_products",
+    "bE": "backlogged_end_products",
+    "p": "ingredient_proportion",
+    "x": "ingredients",
+    "y": "setup_ingredients",
+    "s": "inventory_ingredients",
+}
+PRODUTO_PERIODO = ["produto", "periodo"]
+INGREDIENTE_PERIODO = ["ingrediente", "periodo"]
+INGREDIENTE_PRODUTO_PERIODO = ["ingrediente"] + PRODUTO_PERIODO
+KEY_COLUMNS = {
+    "xE": PRODUTO_PERIODO,
+    "yE": PRODUTO_PERIODO,
+    "sE": PRODUTO_PERIODO,
+    "bE": PRODUTO_PERIODO,
+    "p": INGREDIENTE_PRODUTO_PERIODO,
+    "x": INGREDIENTE_PERIODO,
+    "y": INGREDIENTE_PERIODO,
+    "s": INGREDIENTE_PERIODO,
+}
+
+
+@dataclass
+class SolutionArrays:
+    """Variable values of a solved scenario as dense (K,T), (I,K,T) and (I,T)
+    arrays, keyed by the variable names of matrix_builder."""
+
+    instance: str
+    amount_of_end_products: int
+    capacity_multiplier: float
+    type_cap_ingredients: str
+    coef_cap: float
+    ingredient_capacity: float
+    values: Dict[str, ndarray] = field(default_factory=dict)
+
+    def __getitem__(self, name: str) -> ndarray:
+        return self.values[name]
+
+    def save(self, path: Path) -> None:
+        header = {
+            name: np.asarray(getattr(self, name))
+            for name in (
+                "instance",
+                "amount_of_end_products",
+                "capacity_multiplier",
+                "type_cap_ingredients",
+                "coef_cap",
+                "ingredient_capacity",
+            )
+        }
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        np.savez(path, **header, **self.values)
+
+    @classmethod
+    def load(cls, path: Path) -> "SolutionArrays":
+        with np.load(path) as f:
+            return cls(
+                instance=str(f["instance"]),
+                amount_of_end_products=int(f["amount_of_end_products"]),
+                capacity_multiplier=float(f["capacity_multiplier"]),
+                type_cap_ingredients=str(f["type_cap_ingredients"]),
+                coef_cap=float(f["coef_cap"]),
+                ingredient_capacity=float(f["ingredient_capacity"]),
+                values={name: f[name] for name in VARIABLE_NAMES},
+            )
+
+    def to_long(self) -> pd.DataFrame:
+        # one row per variable, as docplex's get_value_df followed by melt
+        frames = []
+        for name, values in self.values.items():
+            keys = np.indices(values.shape).reshape(values.ndim, -1)
+            frame = pd.DataFrame(dict(zip(KEY_COLUMNS[name], keys)))
+            frame["variable"] = VALUE_NAMES[name]
+            frame["value"] = values.ravel()
+            frames.append(frame)
+        var_results = pd.concat(frames, ignore_index=True)
+        var_results["amount_of_end_products"] = self.amount_of_end_products
+        var_results["instance"] = self.instance
+        var_results["capacity_multiplier"] = self.capacity_multiplier
+        var_results["type_cap_ingredients"] = self.type_cap_ingredients
+        var_results["coef_cap"] = self.coef_cap
+        var_results["ingredient_capacity"] = self.ingredient_capacity
+        return var_results
+
+
+def extract_solution(
+    mdl, data: DataAbstractClass, index: ColumnIndex = None
+) -> SolutionArrays:
+    # a single call for every column, Formulacao1 creates them in ColumnIndex order
+    values = np.asarray(mdl.get_cplex().solution.get_values())
+    return solution_from_values(values, data, index)
+
+
+def solution_from_values(
+    values: ndarray, data: DataAbstractClass, index: ColumnIndex = None
+) -> SolutionArrays:
+    index = index or ColumnIndex(data)
+    arrays = {
+        name: values[index[name]] for name in VARIABLE_NAMES if name in index.columns
+    }
+    if "p" not in arrays:
+        # substituted fixed blend
+        arrays["p"] = data.ub[:, 0, np.newaxis, np.newaxis] * arrays["xE"]
+    return SolutionArrays(
+        instance=data.instance,
+        amount_of_end_products=data.amount_of_end_products,
+        capacity_multiplier=data.capacity_multiplier,
+        type_cap_ingredients=data.type_cap_ingredients,
+        coef_cap=data.coef_cap,
+        ingredient_capacity=data.ingredient_capacity[0],
+        values={name: arrays[name] for name in VARIABLE_NAMES},
+    )
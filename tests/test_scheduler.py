@@ -0,0 +1,61 @@
+from concurrent.futures import Future
+
+import constants
+import scheduler
+
+WORKERS = 8
+
+
+class SimulatedExecutor(object):
+    """Runs nothing: a submission finishes cost / threads seconds after it
+    starts, and wait completes the earliest one."""
+
+    def __init__(self, cores: int):
+        self.cores = cores
+        self.now = 0.0
+        self.running = {}
+        self.threads = []
+
+    def submit(self, fn, task, threads, run_id, cost):
+        future = Future()
+        self.running[future] = (self.now + cost / threads, threads, cost)
+        self.threads.append(threads)
+        assert sum(threads for _, threads, _ in self.running.values()) <= self.cores
+        return future
+
+    def wait(self, futures, return_when):
+        future = min(futures, key=lambda f: self.running[f][0])
+        self.now, _, cost = self.running.pop(future)
+        future.set_result(cost)
+        return {future}, set(futures) - {future}
+
+
+def dispatch(costs, monkeypatch) -> SimulatedExecutor:
+    executor = SimulatedExecutor(WORKERS)
+    monkeypatch.setattr(scheduler, "wait", executor.wait)
+    results = scheduler.dispatch_adaptive(
+        executor, None, ((cost,) for cost in costs), WORKERS, "test"
+    )
+    assert sorted(results) == sorted(costs)
+    return executor
+
+
+def test_thread_budget(monkeypatch):
+    monkeypatch.setattr(constants, "MAX_THREADS", WORKERS)
+    # the queue still fills every worker
+    assert scheduler.thread_budget(40, 0, WORKERS, WORKERS) == 1
+    assert scheduler.thread_budget(WORKERS, WORKERS - 1, WORKERS, WORKERS) == 1
+    # tail: held until the share of the last tasks is idle
+    assert scheduler.thread_budget(2, WORKERS - 1, WORKERS, WORKERS) == 0
+    assert scheduler.thread_budget(2, WORKERS - 4, WORKERS, WORKERS) == 4
+    assert scheduler.thread_budget(1, 0, WORKERS, WORKERS) == WORKERS
+
+
+def test_tail_of_a_sweep_gets_more_than_one_thread(monkeypatch):
+    monkeypatch.setattr(constants, "MAX_THREADS", WORKERS)
+    # longest job first: 40 tasks of decreasing cost on 8 workers
+    costs = [100.0 - 2 * i for i in range(40)]
+    executor = dispatch(costs, monkeypatch)
+    bulk = len(costs) - WORKERS + 1
+    assert executor.threads[:bulk] == [1] * bulk
+    assert max(executor.threads[bulk:]) > 1
@@ -0,0 +1,54 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import wagner_whitin
+from data import DataMultipleProducts
+
+# loose enough for the uncapacitated plan to fit the end product capacity
+SCENARIO = dict(
+    capacity_multiplier=10,
+    type_cap_ingredients="W",
+    coef_cap=1,
+    random_demand=True,
+)
+
+
+@pytest.fixture(autouse=True)
+def repository_root(monkeypatch):
+    # instances are read from ./data
+    monkeypatch.chdir(Path(__file__).resolve().parents[1])
+
+
+def scenario(amount_of_end_products: int) -> DataMultipleProducts:
+    return DataMultipleProducts(
+        "10LLL1.DAT.dat", amount_of_end_products=amount_of_end_products, **SCENARIO
+    )
+
+
+def test_wagner_whitin_single_item():
+    # lots in periods 0 and 2 cost 20, one lot 8 + 2 * 2 + 5 * 2 * 2 = 32
+    cost, production = wagner_whitin.wagner_whitin(np.array([4.0, 2.0, 5.0]), 8, 2)
+    assert cost == 2 * 8 + 2 * 2
+    np.testing.assert_array_equal(production, [6, 0, 5])
+
+
+def test_several_end_products_go_to_the_mip():
+    assert not wagner_whitin.is_uncapacitated_case(scenario(5))
+    assert wagner_whitin.solve_uncapacitated(scenario(5)) is None
+
+
+def test_dp_reaches_the_mip_optimum():
+    pytest.importorskip("highspy")
+    from highs_backend import HighsFormulacao1
+
+    solution, kpis = wagner_whitin.solve_uncapacitated(scenario(1))
+    f1 = HighsFormulacao1(scenario(1), presolve=True)
+    f1.set_parameters(60, threads=1, mipgap=1e-9)
+    _, mip = f1.solve()
+    assert mip["status"] == "OPTIMAL_SOLUTION"
+    assert kpis["Best Bound"] <= mip["objective_function"] * (1 + 1e-9)
+    assert kpis["objective_function"] == pytest.approx(
+        mip["objective_function"], rel=wagner_whitin.DP_GAP
+    )
@@ -1,15 +1,37 @@
 import itertools
 import os
 import re
+import time
 import types
+from concurrent.futures import ProcessPoolExecutor
 from multiprocessing import Pool
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
+from docplex.mp.constants import EffortLevel
+from docplex.mp.progress import ProgressClock, ProgressListener
+from docplex.util.status import JobSolveStatus
 
+from checkpoint import pending_scenarios
+from cuts import LSCutCallback
 from data import Data, DataAbstractClass, DataMultipleProducts
+from heuristics import heuristic_mip_start, primal_heuristic
+from kpis import kpis_from_arrays
+from phase_timer import PhaseTimer
+from result_store import export_results, get_result_sink
+from scheduler import (
+    SolveTimeModel,
+    dispatch_adaptive,
+    longest_job_first,
+    run_packed,
+    simulate_makespan,
+    task_cost,
+)
+from shared_instances import shared_instances
+from solution import extract_solution
+from wagner_whitin import solve_uncapacitated
 
 try:
     from mpi4py import MPI
@@ -27,10 +49,47 @@ import constants
 
 
 class FormulacaoType(ABC):
+    name: str
     data: DataAbstractClass
     model: object
 
 
+class IncumbentTimer(ProgressListener):
+    def __init__(self):
+        super().__init__(ProgressClock.Solutions)
+        self.first_incumbent_time = None
+
+    def notify_start(self):
+        super().notify_start()
+        self.first_incumbent_time = None
+
+    def notify_progress(self, progress_data):
+        if progress_data.has_incumbent and self.first_incumbent_time is None:
+            self.first_incumbent_time = progress_data.time
+
+
+class RootBoundListener(ProgressListener):
+    def __init__(self):
+        super().__init__(ProgressClock.BestBound)
+        self.root_bound = None
+
+    def notify_start(self):
+        super().notify_start()
+        self.root_bound = None
+
+    def notify_progress(self, progress_data):
+        # last bound reported before branching: root LP plus cuts
+        if progress_data.current_nb_nodes == 0:
+            self.root_bound = progress_data.best_bound
+
+
+def number_of_workers() -> int:
+    if MPI_BOOL:
+        # rank 0 is the mpi4py.futures master
+        return max(MPI.COMM_WORLD.Get_size() - 1, 1)
+    return os.cpu_count()
+
+
 def print_info(data: DataAbstractClass, status: str) -> None:
     if MPI_BOOL:
         comm = MPI.COMM_WORLD
@@ -63,97 +122,81 @@ def add_new_kpi(kpis: Dict[str, any], result, data: DataAbstractClass) -> dict:
     kpis["Nodes Processed"] = result.solve_details.nb_nodes_processed
     kpis["Tempo de Solução"] = result.solve_details.time
     kpis["status"] = result.solve_status.name or 1
+    kpis["Time to Optimal"] = (
+        result.solve_details.time
+        if result.solve_status == JobSolveStatus.OPTIMAL_SOLUTION
+        else None
+    )
     return kpis
 
 
-def get_value_df(mdl, variable, value_name, key_columns):
-    return mdl.solution.get_value_df(
-        variable, value_column_name=value_name, key_column_names=key_columns
-    ).melt(id_vars=key_columns, value_vars=[value_name])
-
-
-def get_and_save_results(path_to_read: str, path_to_save: Path) -> None:
-    list_files = []
-    for file in Path(path_to_read).glob("*"):
-        try:
-            list_files.append(pd.read_excel(file, engine="openpyxl"))
-        except:
-            print(f"{file} corrompido")
-    df_results_optimized = pd.concat(list_files)
-    df_results_optimized.to_excel(
-        Path.resolve(Path(path_to_read) / Path(path_to_save)),
-        index=False,
-        engine="openpyxl",
-    )
+def get_and_save_results(path_to_save: Path, formulation: str) -> None:
+    df_results_optimized = get_result_sink(formulation).compact()
+    export_results(df_results_optimized, path_to_save)
 
 
-def extract_variables(mdl, f1, **keys):
-    produto_periodo = keys.get("produto_periodo")
-    ingrediente_produto_periodo = keys.get("ingrediente_produto_periodo")
-    ingrediente_periodo = keys.get("ingrediente_periodo")
+def extract_variables(mdl, f1, long_format: bool = False):
+    solution = extract_solution(mdl, f1.data, f1._column_index)
+    return solution.to_long() if long_format else solution
 
-    end_products = get_value_df(
-        mdl, f1.end_products, value_name="end_products", key_columns=produto_periodo
-    )
-    setup_end_products = get_value_df(
-        mdl,
-        f1.setup_end_products,
-        value_name="setup_end_products",
-        key_columns=produto_periodo,
-    )
-    inventory_end_products = get_value_df(
-        mdl,
-        f1.inventory_end_products,
-        value_name="inventory_end_products",
-        key_columns=produto_periodo,
-    )
-    ingredient_proportion = get_value_df(
-        mdl,
-        f1.ingredient_proportion,
-        value_name="ingredient_proportion",
-        key_columns=ingrediente_produto_periodo,
-    )
-    ingredients = get_value_df(
-        mdl, f1.ingredients, value_name="ingredients", key_columns=ingrediente_periodo
-    )
-    setup_ingredients = get_value_df(
-        mdl,
-        f1.setup_ingredients,
-        value_name="setup_ingredients",
-        key_columns=ingrediente_periodo,
-    )
-    inventory_ingredients = get_value_df(
-        mdl,
-        f1.inventory_ingredients,
-        value_name="inventory_ingredients",
-        key_columns=ingrediente_periodo,
-    )
-    inventory_ingredients = get_value_df(
-        mdl,
-        f1.backlogged_end_products,
-        value_name="backlogged_end_products",
-        key_columns=produto_periodo,
-    )
-    var_results = pd.concat(
-        (
-            end_products,
-            setup_end_products,
-            inventory_end_products,
-            inventory_ingredients,
-            ingredient_proportion,
-            ingredients,
-            setup_ingredients,
-            inventory_ingredients,
-        )
-    )
-    return var_results
 
+def save_results(kpis: dict, complete_path_to_save: Path, formulation: str) -> None:
+    get_result_sink(formulation).append(Path(complete_path_to_save).name, kpis)
 
-def save_results(kpis: dict, complete_path_to_save: str) -> None:
-    df_results_optimized = pd.DataFrame([kpis])
-    df_results_optimized.to_excel(
-        f"{complete_path_to_save}.xlsx", index=False, engine="openpyxl"
-    )
+
+def scenario_path(data: DataAbstractClass) -> Path:
+    return Path.resolve(Path(constants.OTIMIZADOS_INDIVIDUAIS_PATH) / Path(str(data)))
+
+
+def solution_path(data: DataAbstractClass) -> Path:
+    return Path(constants.SOLUTIONS_PATH) / f"{data}.npz"
+
+
+def task_summary(solutions: list, phases: PhaseTimer) -> dict:
+    # only counts and phase totals travel back to the master, results are
+    # already in the sink
+    return {
+        "models": len(solutions),
+        "infeasible": sum(solution is None for solution in solutions),
+        "phases": phases.phases,
+    }
+
+
+def fan_out_results(
+    kpis: dict, data: DataAbstractClass, duplicates, formulation: str
+) -> None:
+    # equivalent scenarios share the solved model, only identifiers change
+    if not duplicates:
+        return
+    solved = (data.capacity_multiplier, data.type_cap_ingredients, data.coef_cap)
+    for duplicate in duplicates:
+        data.update_capacities(*duplicate)
+        duplicate_kpis = add_identifiers(dict(kpis), data=data)
+        duplicate_kpis["status"] = kpis["status"]
+        save_results(
+            kpis=duplicate_kpis,
+            complete_path_to_save=scenario_path(data),
+            formulation=formulation,
+        )
+        print_info(data, "equivalente")
+    data.update_capacities(*solved)
+
+
+def solve_lp_relaxation(mdl, threads: int = 1) -> Optional[float]:
+    import cplex
+
+    # cópia do motor: restrições montadas em bloco não existem no modelo docplex
+    cpx = cplex.Cplex(mdl.get_cplex())
+    cpx.set_log_stream(None)
+    cpx.set_results_stream(None)
+    cpx.set_problem_type(cpx.problem_type.LP)
+    cpx.parameters.timelimit.set(constants.TIMELIMIT)
+    cpx.parameters.threads.set(threads)
+    cpx.solve()
+    # infeasible or stopped at the time limit: no bound, as with HiGHS
+    if cpx.solution.get_status() != cpx.solution.status.optimal:
+        return None
+    return cpx.solution.get_objective_value()
 
 
 def solve_optimized_model(
@@ -164,94 +207,480 @@ def solve_optimized_model(
     type_cap_ingredients,
     coef_cap,
     random_demand,
+    threads: int = 1,
 ):
-    data = DataMultipleProducts(
-        dataset,
-        capacity_multiplier=capacity_multiplier,
-        amount_of_end_products=amount_of_end_products,
-        type_cap_ingredients=type_cap_ingredients,
-        coef_cap=coef_cap,
-        random_demand=random_demand,
-    )
-    f1 = Formulacao(data)
+    phases = PhaseTimer()
+    with phases.phase("Read Data"):
+        data = DataMultipleProducts(
+            dataset,
+            capacity_multiplier=capacity_multiplier,
+            amount_of_end_products=amount_of_end_products,
+            type_cap_ingredients=type_cap_ingredients,
+            coef_cap=coef_cap,
+            random_demand=random_demand,
+        )
+    with phases.phase("Build"):
+        f1 = Formulacao(
+            data,
+            vectorized=constants.VECTORIZED_BUILD,
+            presolve=constants.PRESOLVE_BLEND,
+            tight_big_m=constants.TIGHT_BIG_M,
+            solver_kpis=constants.SOLVER_KPIS,
+            model_cache_path=(
+                constants.MODEL_CACHE_PATH if constants.MODEL_CACHE else None
+            ),
+        )
+    var_results = solve_formulation(f1, threads=threads, phases=phases)
+    with phases.phase("Save"):
+        get_result_sink(f1.name).flush()
+    return task_summary([var_results], phases)
+
+
+def solve_formulation(
+    f1: FormulacaoType,
+    mip_start=None,
+    duplicates=(),
+    threads: int = 1,
+    phases: PhaseTimer = None,
+):
+    # phases already timed for this scenario (reading, building) end up in
+    # its KPIs together with the ones below
+    phases = phases if phases is not None else PhaseTimer()
+    data = f1.data
     mdl = f1.model
-    mdl.set_time_limit(constants.TIMELIMIT)
-    mdl.context.cplex_parameters.threads = 1
-    result = mdl.solve()
-
-    suffix_path = str(data)
-    complete_path_to_save = Path.resolve(
-        Path(constants.OTIMIZADOS_INDIVIDUAIS_PATH) / Path(suffix_path)
-    )
+    if constants.DP_ENGINE:
+        with phases.phase("DP"):
+            dp = solve_uncapacitated(data)
+        if dp is not None:
+            return save_external_solution(
+                f1, *dp, solver="dp", duplicates=duplicates, phases=phases
+            )
+    if f1.backend == "highs":
+        return solve_highs(f1, mip_start, duplicates, threads, phases)
+    mdl.clear_mip_starts()
+    heuristic = None
+    heuristic_time = 0.0
+    if constants.PRIMAL_HEURISTIC or constants.HEURISTIC_ONLY:
+        start = time.time()
+        with phases.phase("Heuristic"):
+            heuristic = primal_heuristic(f1, threads)
+        heuristic_time = time.time() - start
+        if heuristic is not None:
+            heuristic_mip_start(f1, heuristic)
+    # the heuristic's time comes out of the scenario's limit
+    f1.set_parameters(max(constants.TIMELIMIT - heuristic_time, 0.0), threads)
+    if constants.HEURISTIC_ONLY:
+        # stops at the first incumbent: the heuristic's, or CPLEX's own if
+        # relax-and-fix found none; the engine keeps the incumbents of earlier
+        # solves of this model as MIP starts, those would come first
+        mdl.get_cplex().MIP_starts.delete()
+        mdl.parameters.mip.limits.solutions = 1
+    elif mip_start is not None:
+        mdl.add_mip_start(mip_start, effort_level=EffortLevel.Repair)
+    timer = IncumbentTimer()
+    root_bound = RootBoundListener()
+    mdl.add_progress_listener(timer)
+    mdl.add_progress_listener(root_bound)
+    ls_cuts = LSCutCallback(f1) if constants.LS_CUTS else None
+    if ls_cuts is not None:
+        ls_cuts.attach(mdl)
+    with phases.phase("Solve"):
+        result = mdl.solve()
+    mdl.remove_progress_listener(timer)
+    mdl.remove_progress_listener(root_bound)
+    if ls_cuts is not None:
+        ls_cuts.detach(mdl)
+    if constants.HEURISTIC_ONLY:
+        mdl.parameters.mip.limits.solutions.reset()
+
+    complete_path_to_save = scenario_path(data)
 
     if result == None:
-        print_info(data, "infactível")
-        kpis = add_identifiers(dict(), data=data)
-        save_results(kpis=kpis, complete_path_to_save=complete_path_to_save)
-        return None
-
-    produto_periodo = ["produto", "periodo"]
-    ingrediente_produto_periodo = ["ingrediente"] + produto_periodo
-    ingrediente_periodo = ["ingrediente", "periodo"]
-
-    var_results = extract_variables(
-        mdl,
-        f1,
-        produto_periodo=produto_periodo,
-        ingrediente_produto_periodo=ingrediente_produto_periodo,
-        ingrediente_periodo=ingrediente_periodo,
-    )
+        return save_infeasible(f1, duplicates, phases)
 
-    var_results["amount_of_end_products"] = data.amount_of_end_products
-    var_results["instance"] = data.instance
-    var_results["capacity_multiplier"] = data.capacity_multiplier
-    var_results["type_cap_ingredients"] = data.type_cap_ingredients
-    var_results["ingredient_capacity"] = data.ingredient_capacity[0]
+    with phases.phase("Extract"):
+        var_results = extract_variables(mdl, f1)
+        if constants.SAVE_SOLUTIONS:
+            var_results.save(solution_path(data))
 
     kpis = mdl.kpis_as_dict(result, objective_key="objective_function")
+    if not f1.solver_kpis:
+        kpis = dict(
+            kpis_from_arrays(data, var_results),
+            objective_function=kpis["objective_function"],
+        )
     kpis = add_new_kpi(kpis, result, data)
+    kpis["Formulation"] = f1.name
+    kpis["Solver"] = "cplex"
+    kpis["Tight Big M"] = f1.tight_big_m
+    kpis["Model Cache"] = f1.from_cache
+    kpis["Threads"] = threads
+    kpis["Warm Start"] = mip_start is not None and not constants.HEURISTIC_ONLY
+    kpis["Heuristic Only"] = constants.HEURISTIC_ONLY
+    kpis["Heuristic Objective"] = (
+        heuristic.objective_value if heuristic is not None else None
+    )
+    # solved at the root without a callback call: incumbent known only at the end
+    kpis["Time to First Incumbent"] = (
+        timer.first_incumbent_time
+        if timer.first_incumbent_time is not None
+        else result.solve_details.time
+    )
 
-    # Cálculo da relaxação linear
-    relaxed_model = mdl.clone()
-    status = relaxed_model.solve(url=None, key=None, log_output=False)
-
-    relaxed_objective_value = relaxed_model.objective_value
-    kpis["Relaxed Objective Value"] = relaxed_objective_value
+    # closed at the root: the final bound is the root bound
+    if constants.HEURISTIC_ONLY:
+        kpis["Root Bound"] = None
+    elif result.solve_details.nb_nodes_processed == 0:
+        kpis["Root Bound"] = result.solve_details.best_bound
+    else:
+        kpis["Root Bound"] = root_bound.root_bound
+    if ls_cuts is not None:
+        kpis.update(ls_cuts.kpis(result.objective_value, kpis["Root Bound"]))
 
-    save_results(kpis=kpis, complete_path_to_save=complete_path_to_save)
+    # Cálculo da relaxação linear
+    if constants.LP_RELAXATION:
+        with phases.phase("Relaxation"):
+            kpis["Relaxed Objective Value"] = solve_lp_relaxation(mdl, threads)
+
+    kpis.update(phases.as_kpis())
+    with phases.phase("Save"):
+        save_results(
+            kpis=kpis,
+            complete_path_to_save=complete_path_to_save,
+            formulation=f1.name,
+        )
+        fan_out_results(kpis, data, duplicates, f1.name)
 
     print_info(data, "concluído")
     gc.collect()
     return var_results
 
 
-def running_all_instance_with_chosen_capacity(
-    Formulacao: FormulacaoType, path_to_save: str
+def save_infeasible(f1: FormulacaoType, duplicates=(), phases: PhaseTimer = None):
+    data = f1.data
+    print_info(data, "infactível")
+    kpis = add_identifiers(phases.as_kpis(), data=data)
+    kpis["Formulation"] = f1.name
+    with phases.phase("Save"):
+        save_results(
+            kpis=kpis,
+            complete_path_to_save=scenario_path(data),
+            formulation=f1.name,
+        )
+        fan_out_results(kpis, data, duplicates, f1.name)
+    return None
+
+
+def solve_highs(
+    f1: FormulacaoType,
+    mip_start=None,
+    duplicates=(),
+    threads: int = 1,
+    phases: PhaseTimer = None,
 ):
-    final_results = []
+    # heuristics, (l,S) cuts and the model cache work on the CPLEX engine only
+    f1.set_parameters(constants.TIMELIMIT, threads)
+    with phases.phase("Solve"):
+        var_results, kpis = f1.solve(mip_start)
+    if var_results is None:
+        return save_infeasible(f1, duplicates, phases)
+    kpis["Tight Big M"] = f1.tight_big_m
+    kpis["Threads"] = threads
+    kpis["Warm Start"] = mip_start is not None
+    if constants.LP_RELAXATION:
+        with phases.phase("Relaxation"):
+            kpis["Relaxed Objective Value"] = f1.solve_lp_relaxation(threads)
+    return save_external_solution(
+        f1, var_results, kpis, solver="highs", duplicates=duplicates, phases=phases
+    )
 
-    if not MPI_BOOL:
-        with Pool() as executor:
-            futures = executor.starmap(
-                solve_optimized_model, ((Formulacao,) + x for x in constants.ITERATOR)
-            )
-            final_results.append(futures)
 
+def save_external_solution(
+    f1: FormulacaoType,
+    var_results,
+    kpis: dict,
+    solver: str,
+    duplicates=(),
+    phases: PhaseTimer = None,
+):
+    # scenario solved without docplex: Wagner-Whitin engine or HiGHS
+    data = f1.data
+    if constants.SAVE_SOLUTIONS:
+        var_results.save(solution_path(data))
+    status = kpis.get("status", JobSolveStatus.OPTIMAL_SOLUTION.name)
+    kpis = add_identifiers(kpis, data=data)
+    kpis["status"] = status
+    kpis["Formulation"] = f1.name
+    kpis["Solver"] = solver
+    kpis.update(phases.as_kpis())
+    with phases.phase("Save"):
+        save_results(
+            kpis=kpis,
+            complete_path_to_save=scenario_path(data),
+            formulation=f1.name,
+        )
+        fan_out_results(kpis, data, duplicates, f1.name)
+    print_info(data, f"concluído ({solver})")
+    return var_results
+
+
+def solve_capacity_sweep(
+    Formulacao: FormulacaoType,
+    dataset: str,
+    amount_of_end_products,
+    random_demand,
+    capacity_scenarios,
+    threads: int = 1,
+):
+    # one model per (instance, end products, demand draw), capacities only
+    # change right-hand sides between solves
+    # the shared model's reading and building are reported by the first scenario
+    task_phases = PhaseTimer()
+    phases = PhaseTimer()
+    capacity_multiplier, type_cap_ingredients, coef_cap = capacity_scenarios[0]
+    with phases.phase("Read Data"):
+        data = DataMultipleProducts(
+            dataset,
+            capacity_multiplier=capacity_multiplier,
+            amount_of_end_products=amount_of_end_products,
+            type_cap_ingredients=type_cap_ingredients,
+            coef_cap=coef_cap,
+            random_demand=random_demand,
+        )
+    with phases.phase("Build"):
+        f1 = Formulacao(
+            data,
+            vectorized=constants.VECTORIZED_BUILD,
+            presolve=constants.PRESOLVE_BLEND,
+            tight_big_m=constants.TIGHT_BIG_M,
+            solver_kpis=constants.SOLVER_KPIS,
+            model_cache_path=(
+                constants.MODEL_CACHE_PATH if constants.MODEL_CACHE else None
+            ),
+        )
+        equivalent = deduplicate_capacity_scenarios(data, capacity_scenarios)
+    if constants.WARM_START:
+        chained = order_capacity_scenarios(data, list(equivalent))
     else:
-        with MPIPoolExecutor() as executor:
-            futures = executor.starmap(
-                solve_optimized_model,
-                ((Formulacao,) + x for x in constants.ITERATOR),
+        chained = [(scenario, None) for scenario in equivalent]
+    # plans kept only for the scenarios that warm start another one
+    parents = {parent for _, parent in chained}
+    plans = {}
+    results = []
+    for position, (scenario, parent) in enumerate(chained):
+        with phases.phase("Update"):
+            f1.update_capacities(*scenario)
+        results.append(
+            solve_formulation(
+                f1,
+                mip_start=plans.get(parent),
+                duplicates=equivalent[scenario],
+                threads=threads,
+                phases=phases,
             )
-            final_results.append(futures)
-            executor.shutdown(wait=True)
+        )
+        task_phases.merge(phases.phases)
+        phases = PhaseTimer()
+        if position not in parents:
+            continue
+        if f1.backend == "highs":
+            plans[position] = f1.incumbent()
+        elif f1.model.solution is not None:
+            with phases.phase("MIP Start"):
+                plans[position] = build_mip_start(f1)
+    task_phases.merge(phases.phases)
+    with task_phases.phase("Save"):
+        get_result_sink(f1.name).flush()
+    return task_summary(results, task_phases)
+
+
+def deduplicate_capacity_scenarios(
+    data: DataMultipleProducts, capacity_scenarios
+) -> Dict[tuple, List[tuple]]:
+    # scenarios whose effective data is identical (e.g. every coef_cap of the
+    # "W" arm) are solved once, keyed by the first scenario seen
+    representatives = {}
+    equivalent = {}
+    for scenario in capacity_scenarios:
+        data.update_capacities(*scenario)
+        representative = representatives.setdefault(data.canonical_key(), scenario)
+        if representative == scenario:
+            equivalent[scenario] = []
+        else:
+            equivalent[representative].append(scenario)
+    return equivalent
+
+
+def build_mip_start(f1: FormulacaoType):
+    mdl = f1.model
+    mip_start = mdl.new_solution()
+    for variables in (
+        f1.setup_end_products,
+        f1.end_products,
+        f1.setup_ingredients,
+        f1.ingredients,
+    ):
+        dvars = list(variables.values())
+        for var, value in zip(dvars, mdl.solution.get_values(dvars)):
+            mip_start.add_var_value(var, value)
+    return mip_start
+
+
+def order_capacity_scenarios(
+    data: DataMultipleProducts, capacity_scenarios
+) -> List[Tuple[tuple, Optional[int]]]:
+    """Scenarios from tight to loose ingredient capacity, then end product
+    capacity, each with the position of the one whose plan warm starts it.
+
+    That is the latest earlier scenario with no capacity looser than its own:
+    capacity only grows along a chain, so the previous plan stays feasible.
+    None starts a new chain.
+    """
+    capacities = {}
+    for scenario in capacity_scenarios:
+        data.update_capacities(*scenario)
+        capacities[scenario] = (data.ingredient_capacity[0], data.capacity)
+    ordered = sorted(capacity_scenarios, key=capacities.get)
+    chained = []
+    for position, scenario in enumerate(ordered):
+        ingredient_capacity, capacity = capacities[scenario]
+        parent = next(
+            (
+                earlier
+                for earlier in range(position - 1, -1, -1)
+                if capacities[ordered[earlier]][0] <= ingredient_capacity
+                and capacities[ordered[earlier]][1] <= capacity
+            ),
+            None,
+        )
+        chained.append((scenario, parent))
+    return chained
 
-    # pd.concat(final_results[0]).to_excel(
-    #     Path(Path(constants.FINAL_PATH) / Path("variaveis.xlsx")), engine="openpyxl"
-    # )
 
-    get_and_save_results(
-        path_to_read=constants.OTIMIZADOS_INDIVIDUAIS_PATH,
-        path_to_save=str(Path.resolve(Path(constants.FINAL_PATH) / Path(path_to_save))),
-    )
+def group_capacity_scenarios(iterator, scenarios_per_model=None) -> List[tuple]:
+    groups = {}
+    for (
+        dataset,
+        end_products,
+        capmult,
+        type_cap_ingredients,
+        coef_cap,
+        random_demand,
+    ) in iterator:
+        groups.setdefault((dataset, end_products, random_demand), []).append(
+            (capmult, type_cap_ingredients, coef_cap)
+        )
+    sweeps = []
+    for key, scenarios in groups.items():
+        size = scenarios_per_model or len(scenarios)
+        for start in range(0, len(scenarios), size):
+            sweeps.append(key + (scenarios[start : start + size],))
+    return sweeps
+
+
+def collect_results(results, total: int) -> PhaseTimer:
+    # consumes task summaries as they arrive, the master holds only the totals
+    totals = {"models": 0, "infeasible": 0}
+    profile = PhaseTimer()
+    for done, summary in enumerate(results, start=1):
+        for key in totals:
+            totals[key] += summary[key]
+        profile.merge(summary["phases"])
+        print(
+            f"{done}/{total} tarefas, {totals['models']} modelos resolvidos, "
+            f"{totals['infeasible']} infactíveis"
+        )
+    return profile
+
+
+def save_profile(profile: PhaseTimer, path_to_save: Path) -> None:
+    # tempo somado de todos os workers por fase, pico de memória do pior worker
+    df = profile.profile()
+    print(df.to_string(float_format="{:.2f}".format))
+    df.to_csv(path_to_save.with_name(f"{path_to_save.stem}_profile.csv"))
+
+
+def running_all_instance_with_chosen_capacity(
+    Formulacao: FormulacaoType, path_to_save: str
+):
+    iterator = constants.ITERATOR
+    if constants.RESUME:
+        iterator = pending_scenarios(
+            iterator,
+            get_result_sink(Formulacao.name).latest_records(),
+            rerun_gap_above=constants.RERUN_GAP_ABOVE,
+            heuristic_only=constants.HEURISTIC_ONLY,
+        )
+        print(
+            f"{len(constants.ITERATOR) - len(iterator)} cenários já concluídos, "
+            f"{len(iterator)} pendentes"
+        )
+
+    if constants.CAPACITY_SWEEP:
+        task = solve_capacity_sweep
+        arguments = group_capacity_scenarios(iterator, constants.SCENARIOS_PER_MODEL)
+    else:
+        task = solve_optimized_model
+        arguments = iterator
+
+    workers = number_of_workers()
+    predicted_costs = None
+    if constants.LONGEST_JOB_FIRST:
+        cost_model = SolveTimeModel.from_history(constants.HISTORY_PATTERN)
+        original_costs = [
+            task_cost(x, cost_model, constants.CAPACITY_SWEEP) for x in arguments
+        ]
+        arguments, predicted_costs = longest_job_first(
+            arguments, cost_model, constants.CAPACITY_SWEEP
+        )
+        print(
+            f"Makespan previsto: {simulate_makespan(predicted_costs, workers):.0f}s "
+            f"(ordem original {simulate_makespan(original_costs, workers):.0f}s) "
+            f"em {workers} workers"
+        )
+
+    start = time.perf_counter()
+    packed = ((Formulacao,) + x for x in arguments)
+    files = sorted({x[0] for x in arguments})
+    with shared_instances(files, MPI_BOOL) as (initializer, initargs):
+        if constants.ADAPTIVE_THREADS:
+            run_id = f"{os.environ.get('PBS_JOBID', 'local')}-{os.getpid()}"
+            executor_class = MPIPoolExecutor if MPI_BOOL else ProcessPoolExecutor
+            with executor_class(
+                max_workers=workers, initializer=initializer, initargs=initargs
+            ) as executor:
+                profile = collect_results(
+                    dispatch_adaptive(executor, task, packed, workers, run_id),
+                    len(arguments),
+                )
+
+        elif not MPI_BOOL:
+            with Pool(initializer=initializer, initargs=initargs) as executor:
+                # chunksize=1 keeps the submission order, chunks would undo it
+                profile = collect_results(
+                    executor.imap_unordered(
+                        run_packed, ((task, x) for x in packed), chunksize=1
+                    ),
+                    len(arguments),
+                )
+
+        else:
+            with MPIPoolExecutor(
+                initializer=initializer, initargs=initargs
+            ) as executor:
+                profile = collect_results(
+                    executor.starmap(task, packed, unordered=True), len(arguments)
+                )
+                executor.shutdown(wait=True)
+    makespan = time.perf_counter() - start
+
+    if predicted_costs is not None:
+        print(
+            f"Makespan previsto {simulate_makespan(predicted_costs, workers):.0f}s, "
+            f"real {makespan:.0f}s"
+        )
+
+    path_to_save = Path.resolve(Path(constants.FINAL_PATH) / Path(path_to_save))
+    save_profile(profile, path_to_save)
+    get_and_save_results(path_to_save=path_to_save, formulation=Formulacao.name)
     print(f"Concluído")
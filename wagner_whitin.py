@@ -0,0 +1,187 @@
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+from numpy import ndarray
+
+from data import DataMultipleProducts
+from kpis import backlog_cost, end_product_capacity_usage, kpis_from_arrays
+from solution import SolutionArrays
+
+# relative gap under which the DP plan is reported as optimal, CPLEX's default
+DP_GAP = 1e-4
+
+
+def wagner_whitin(
+    demand: ndarray, setup_cost: float, holding_cost: float
+) -> Tuple[float, ndarray]:
+    """Uncapacitated single item lot sizing without backlog, O(T^2).
+
+    Returns the setup plus holding cost of the optimal plan and its
+    production per period; each lot covers the demand of the periods up to
+    the next one.
+    """
+    T = demand.shape[0]
+    periods = np.arange(T)
+    cumulative = np.concatenate([[0], np.cumsum(demand)])
+    weighted = np.concatenate([[0], np.cumsum(periods * demand)])
+    first, last = periods[:, np.newaxis], periods[np.newaxis, :]
+    # [j, l]: lot produced in j covering the demand of j..l
+    amount = cumulative[last + 1] - cumulative[first]
+    lot_cost = np.where(amount > 0, setup_cost, 0.0) + holding_cost * (
+        weighted[last + 1] - weighted[first] - first * amount
+    )
+    lot_cost = np.where(first <= last, lot_cost, np.inf)
+    best = np.zeros(T + 1)
+    lot_start = np.zeros(T, dtype=int)
+    for last_period in range(T):
+        costs = best[: last_period + 1] + lot_cost[: last_period + 1, last_period]
+        lot_start[last_period] = np.argmin(costs)
+        best[last_period + 1] = costs[lot_start[last_period]]
+    production = np.zeros(T)
+    last_period = T - 1
+    while last_period >= 0:
+        start = lot_start[last_period]
+        production[start] = cumulative[last_period + 1] - cumulative[start]
+        last_period = start - 1
+    return best[T], production
+
+
+def echelon_holding_end(data: DataMultipleProducts) -> float:
+    # holding an end product only adds its value over the ingredients it holds
+    return data.holding_cost_end[0] - np.dot(
+        data.ub[:, 0], data.holding_cost_ingredient
+    )
+
+
+def backlog_never_pays(data: DataMultipleProducts) -> bool:
+    """Without capacity, backlogging beats neither serving a unit from an
+    earlier lot (held for the whole horizon at worst) nor opening new end
+    product and ingredient setups for a whole period's demand."""
+    ub = data.ub[:, 0]
+    penalty = backlog_cost(data)
+    unit_cost = data.production_cost_end[0] + np.dot(
+        ub, data.production_cost_ingredient
+    )
+    held = (data.PERIODS.shape[0] - 1) * (
+        data.holding_cost_end[0] + np.dot(ub, data.holding_cost_ingredient)
+    )
+    setups = data.setup_cost_end[0] + np.sum(data.setup_cost_ingredient)
+    demand = data.demand_end[data.demand_end > 0]
+    return (
+        penalty > unit_cost + held
+        and demand.size > 0
+        and demand.min() * (penalty - unit_cost) > setups
+    )
+
+
+def is_uncapacitated_case(data: DataMultipleProducts) -> bool:
+    # one end product, ingredients without capacity, fixed blend and no reason
+    # to backlog: Formulacao1 reduces to two levels of uncapacitated lot
+    # sizing. With more end products the echelon bound stays 0.4-1.3% below
+    # the optimum, far from DP_GAP, and the DP would only delay the MIP
+    return (
+        data.END_PRODUCTS.shape[0] == 1
+        and np.isinf(data.ingredient_capacity[0])
+        and np.allclose(data.lb, data.ub)
+        and echelon_holding_end(data) >= 0
+        and backlog_never_pays(data)
+    )
+
+
+def lower_bound(data: DataMultipleProducts) -> float:
+    """Echelon relaxation: ingredient stock measured together with the end
+    products that contain it, dropping the requirement that it is available
+    when the end product is made, decouples every item into a WW problem."""
+    ub = data.ub[:, 0]
+    total_demand = data.demand_end.sum(axis=0)
+    end_products = sum(
+        wagner_whitin(demand, data.setup_cost_end[0], echelon_holding_end(data))[0]
+        for demand in data.demand_end
+    )
+    ingredients = sum(
+        wagner_whitin(ub[i] * total_demand, setup_cost, holding_cost)[0]
+        for i, (setup_cost, holding_cost) in enumerate(
+            zip(data.setup_cost_ingredient, data.holding_cost_ingredient)
+        )
+    )
+    variable = total_demand.sum() * (
+        data.production_cost_end[0] + np.dot(ub, data.production_cost_ingredient)
+    )
+    return end_products + ingredients + variable
+
+
+def plan_from_end_products(
+    data: DataMultipleProducts, end_products: ndarray
+) -> SolutionArrays:
+    # ingredients follow the consumption of the end product plan, each by WW
+    ub = data.ub[:, 0]
+    consumption = end_products.sum(axis=0)
+    ingredients = np.array(
+        [
+            wagner_whitin(ub[i] * consumption, setup_cost, holding_cost)[1]
+            for i, (setup_cost, holding_cost) in enumerate(
+                zip(data.setup_cost_ingredient, data.holding_cost_ingredient)
+            )
+        ]
+    )
+    proportion = ub[:, np.newaxis, np.newaxis] * end_products[np.newaxis]
+    return SolutionArrays(
+        instance=data.instance,
+        amount_of_end_products=data.amount_of_end_products,
+        capacity_multiplier=data.capacity_multiplier,
+        type_cap_ingredients=data.type_cap_ingredients,
+        coef_cap=data.coef_cap,
+        ingredient_capacity=data.ingredient_capacity[0],
+        values={
+            "xE": end_products,
+            "yE": (end_products > 0).astype(float),
+            "sE": np.cumsum(end_products - data.demand_end, axis=1),
+            "bE": np.zeros_like(end_products),
+            "p": proportion,
+            "x": ingredients,
+            "y": (ingredients > 0).astype(float),
+            "s": np.cumsum(ingredients - proportion.sum(axis=1), axis=1),
+        },
+    )
+
+
+def solve_uncapacitated(
+    data: DataMultipleProducts,
+) -> Optional[Tuple[SolutionArrays, dict]]:
+    """Plan and KPIs of the scenario when the DP settles it, None otherwise.
+
+    The best of the end product plans by WW (echelon and physical holding),
+    each with the ingredients planned by WW on its consumption, is optimal
+    when it is within DP_GAP of the echelon lower bound and fits the end
+    product capacity, which the DP leaves out.
+    """
+    start = time.time()
+    if not is_uncapacitated_case(data):
+        return None
+    best_bound = lower_bound(data)
+    best = None
+    for holding_cost in (echelon_holding_end(data), data.holding_cost_end[0]):
+        end_products = np.array(
+            [
+                wagner_whitin(demand, data.setup_cost_end[0], holding_cost)[1]
+                for demand in data.demand_end
+            ]
+        )
+        solution = plan_from_end_products(data, end_products)
+        costs = kpis_from_arrays(data, solution)
+        if best is None or costs["objective_function"] < best[1]["objective_function"]:
+            best = solution, costs
+    solution, kpis = best
+    gap = (kpis["objective_function"] - best_bound) / abs(kpis["objective_function"])
+    if (
+        gap > DP_GAP
+        or (end_product_capacity_usage(data, solution) > data.capacity + 1e-6).any()
+    ):
+        return None
+    kpis["Best Bound"] = best_bound
+    kpis["Gap"] = max(gap, 0.0)
+    kpis["Nodes Processed"] = 0
+    kpis["Tempo de Solução"] = time.time() - start
+    kpis["Time to Optimal"] = kpis["Tempo de Solução"]
+    return solution, kpis